@@ -4,35 +4,200 @@ LangChain - Document Summarization and Information Extraction
 Extracts key information from meeting transcripts including action items,
 decisions made, and questions raised.
 
+The transcript is streamed from a memory-mapped file and split on the fly,
+chunks are extracted concurrently (map stage) and the per-chunk findings are
+then merged in batches by the summary prompt (hierarchical reduce stage), so
+long transcripts neither run hundreds of sequential LLM calls nor overflow the
+context window on the final call, and memory stays flat for very large files.
+Per-chunk results are cached in SQLite, so re-running on an edited transcript
+only sends the changed chunks to the LLM. An optional packing mode merges
+splitter segments up to a token budget to cut the number of LLM calls.
+Findings repeated across overlapping chunks are dropped with a MinHash index
+before the reduce stage.
+
 Requirements:
 - langchain
 - openai
+- tiktoken
 - OpenAI API key
 
 Author: AI Agents Article Examples
 """
 
 import os
+import codecs
+import hashlib
+import itertools
+import mmap
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator
+import tiktoken
 from langchain.agents import initialize_agent, AgentType
 from langchain.chat_models import ChatOpenAI
 from langchain.tools import Tool
-from langchain.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+from langchain.schema import Document
+
+# Concurrency and reduce settings
+MAX_CONCURRENCY = int(os.environ.get("EXTRACTOR_MAX_CONCURRENCY", "8"))
+REDUCE_BATCH_SIZE = int(os.environ.get("EXTRACTOR_REDUCE_BATCH_SIZE", "10"))
+STREAM_WINDOW_BYTES = int(os.environ.get("EXTRACTOR_STREAM_WINDOW_BYTES", str(1 << 20)))
+TRANSCRIPT_PATH = "meeting_transcript.txt"
+
+# Chunk result cache settings
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "./output")
+CACHE_MAX_BYTES = int(os.environ.get("EXTRACTOR_CACHE_MAX_BYTES", str(64 << 20)))
+
+# Near-duplicate finding detection (estimated Jaccard similarity of shingles)
+DEDUP_THRESHOLD = float(os.environ.get("EXTRACTOR_DEDUP_THRESHOLD", "0.7"))
+
+# Token-budget packing settings (context window minus the output reserve is
+# shared by the prompt template and the packed transcript text)
+PACK_CHUNKS = os.environ.get("EXTRACTOR_PACK_CHUNKS", "False").lower() == "true"
+CONTEXT_TOKENS = int(os.environ.get("EXTRACTOR_CONTEXT_TOKENS", "8192"))
+OUTPUT_RESERVE_TOKENS = int(os.environ.get("EXTRACTOR_OUTPUT_RESERVE_TOKENS", "1500"))
 
 # Initialize the language model
 llm = ChatOpenAI(model="gpt-4", temperature=0)
 
-# Load and prepare the document
-loader = TextLoader("meeting_transcript.txt")
-documents = loader.load()
+# Token counter shared by chunk packing and reduce batching
+encoding = tiktoken.encoding_for_model(llm.model_name)
+
 
+def count_tokens(text: str) -> int:
+    """Number of model tokens in ``text``."""
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# Prepare the splitter; the document itself is streamed (see stream_chunks)
 text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=1000, 
     chunk_overlap=200
 )
-chunks = text_splitter.split_documents(documents)
+
+
+def stream_chunks(file_path: str, splitter: RecursiveCharacterTextSplitter,
+                  window_bytes: int = STREAM_WINDOW_BYTES) -> Iterator[Document]:
+    """Lazily split a text file into chunks without loading it into memory.
+    
+    The file is memory-mapped and decoded one window at a time. Each window is
+    cut at the last paragraph (or line/word) break, the completed part is split
+    with ``splitter`` and the remainder is carried into the next window. The
+    tail of the last emitted chunk is carried as well, so chunks keep the
+    splitter's overlap across window boundaries.
+    
+    Args:
+        file_path: Path to a UTF-8 text file
+        splitter: Splitter providing chunk size and overlap behaviour
+        window_bytes: Number of bytes decoded per window. The default (1 MiB)
+            gives practically the same chunks as splitting the whole file;
+            small windows (a few KB) cut at window boundaries often enough to
+            emit noticeably more chunks (about 12% more at 4 KB)
+        
+    Yields:
+        Documents compatible with ``splitter.split_documents`` output
+    """
+    overlap = splitter._chunk_overlap
+    max_carry = max(window_bytes, splitter._chunk_size * 4)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    metadata = {"source": file_path}
+    carry = ""
+    
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in range(0, size, window_bytes):
+                final = offset + window_bytes >= size
+                window = mm[offset:offset + window_bytes]
+                text = carry + decoder.decode(window, final=final)
+                if final:
+                    head, carry = text, ""
+                else:
+                    cut = -1
+                    for separator in ("\n\n", "\n", " "):
+                        cut = text.rfind(separator)
+                        if cut > overlap:
+                            break
+                    if cut <= overlap:
+                        if len(text) < max_carry:
+                            carry = text
+                            continue
+                        cut = len(text)
+                    head, carry = text[:cut], text[cut:]
+                
+                pieces = splitter.split_text(head)
+                for piece in pieces:
+                    yield Document(page_content=piece, metadata=dict(metadata))
+                if pieces and not final:
+                    tail = pieces[-1][-overlap:] if overlap else ""
+                    space = tail.find(" ")
+                    tail = tail[space + 1:] if space != -1 else tail
+                    carry = tail + carry
+
+
+def _overlap_length(previous: str, following: str, max_overlap: int) -> int:
+    """Length of the longest suffix of ``previous`` that prefixes ``following``."""
+    for size in range(min(len(previous), len(following), max_overlap), 0, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+def pack_chunks(chunks: Iterable[Document], budget_tokens: int,
+                count_tokens: Callable[[str], int], max_overlap: int = 200,
+                stats: dict = None) -> Iterator[Document]:
+    """Greedily merge consecutive splitter segments up to a token budget.
+    
+    Segments are appended whole, so packed chunks always start and end on the
+    splitter's boundaries. The overlap a segment shares with its predecessor
+    is dropped when both land in the same packed chunk, and kept when the
+    segment starts a new one, so context across packed chunks is preserved.
+    
+    Args:
+        chunks: Splitter output in document order
+        budget_tokens: Maximum transcript tokens per packed chunk
+        count_tokens: Function returning the token count of a string
+        max_overlap: Upper bound on overlap between consecutive segments
+        stats: Optional dict updated with ``segments`` and ``packed`` counts
+        
+    Yields:
+        Packed Documents
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("segments", 0)
+    stats.setdefault("packed", 0)
+    parts, tokens, previous, metadata = [], 0, None, {}
+    
+    for chunk in chunks:
+        stats["segments"] += 1
+        text = chunk.page_content
+        if previous is not None:
+            overlap = _overlap_length(previous, text, max_overlap)
+            addition = text[overlap:] if overlap else "\n" + text
+            addition_tokens = count_tokens(addition)
+            if tokens + addition_tokens <= budget_tokens:
+                parts.append(addition)
+                tokens += addition_tokens
+                previous = text
+                continue
+            stats["packed"] += 1
+            yield Document(page_content="".join(parts), metadata=metadata)
+        parts, tokens, previous = [text], count_tokens(text), text
+        metadata = dict(chunk.metadata)
+    
+    if parts:
+        stats["packed"] += 1
+        yield Document(page_content="".join(parts), metadata=metadata)
+
 
 # Define extraction prompt
 extraction_prompt = PromptTemplate(
@@ -49,17 +214,7 @@ extraction_prompt = PromptTemplate(
 
 extraction_chain = LLMChain(llm=llm, prompt=extraction_prompt)
 
-# Process each chunk and compile results
-all_action_items = []
-all_decisions = []
-all_questions = []
-
-for chunk in chunks:
-    result = extraction_chain.run({"text": chunk.page_content})
-    # Parse result into categories (simplified for demo)
-    print(f"Processed chunk {chunks.index(chunk) + 1}/{len(chunks)}")
-
-# Generate final summary report
+# Define summary prompt used by the reduce stage
 summary_prompt = PromptTemplate(
     input_variables=["findings"],
     template="""Compile all extracted findings into a single executive summary.
@@ -68,20 +223,507 @@ summary_prompt = PromptTemplate(
     {findings}
     
     Create a clean, organized report with clear sections.""")
+
+summary_chain = LLMChain(llm=llm, prompt=summary_prompt)
+
+
+class ChunkResultCache:
+    """Persistent, size-bounded LRU cache of per-chunk extraction results.
+    
+    Entries live in a SQLite file and are keyed by a hash of everything that
+    determines the LLM output: chunk text, prompt template, model name and
+    temperature. When the stored results exceed ``max_bytes`` the least
+    recently used entries are evicted.
+    
+    Example:
+        >>> cache = ChunkResultCache("./output/chunk_cache.sqlite")
+        >>> key = cache.make_key("text", "template {text}", "gpt-4", 0)
+        >>> cache.get(key) is None
+        True
+    """
+    
+    def __init__(self, path: str, max_bytes: int = CACHE_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunk_results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_used ON chunk_results (last_used)"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(text: str, template: str, model: str, temperature: float) -> str:
+        """Build the content-addressed key for one chunk extraction."""
+        digest = hashlib.sha256()
+        for part in (text, template, model, repr(float(temperature))):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+    
+    def get(self, key: str):
+        """Return the cached result for ``key`` or None, updating recency."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM chunk_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE chunk_results SET last_used = ? WHERE key = ?",
+                (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+    
+    def put(self, key: str, result: str):
+        """Store a result and evict least recently used entries over budget."""
+        size = len(result.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_results VALUES (?, ?, ?, ?)",
+                (key, result, size, time.time())
+            )
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM chunk_results"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM chunk_results ORDER BY last_used"
+                )
+                evict = []
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    total -= old_size
+                self._conn.executemany("DELETE FROM chunk_results WHERE key = ?", evict)
+            self._conn.commit()
+    
+    def stats(self) -> dict:
+        """Return hit/miss counters and current on-disk usage."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunk_results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+chunk_cache = ChunkResultCache(os.path.join(OUTPUT_DIR, "chunk_cache.sqlite"))
+
+
+def extract_chunk(text: str) -> str:
+    """Extract findings from one chunk, serving repeats from the cache."""
+    key = chunk_cache.make_key(
+        text, extraction_prompt.template, llm.model_name, llm.temperature
+    )
+    result = chunk_cache.get(key)
+    if result is None:
+        result = extraction_chain.run({"text": text})
+        chunk_cache.put(key, result)
+    return result
+
+
+_END = object()
+
+
+def map_ordered(fn: Callable[[str], str], items: Iterable[str],
+                max_workers: int = MAX_CONCURRENCY) -> Iterator[str]:
+    """Apply ``fn`` concurrently, yielding results lazily in input order.
+    
+    ``items`` may be a lazy iterator: it is pulled only as slots free up, and
+    calls in flight plus finished results waiting for an earlier slow one
+    never exceed ``2 * max_workers``, so memory stays flat however many items
+    there are.
+    
+    Args:
+        fn: Function applied to each item
+        items: Inputs in order
+        max_workers: Maximum number of calls in flight at once
+        
+    Yields:
+        ``fn(item)`` for each item, in the same order as ``items``
+    """
+    max_workers = max(1, max_workers)
+    pending = {}
+    finished = {}
+    submitted = 0
+    next_index = 0
+    items = iter(items)
+    exhausted = False
     
-final_report = extraction_chain.run(
-    {"text": " ".join([c.page_content for c in chunks])}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            while not exhausted and len(pending) + len(finished) < 2 * max_workers:
+                item = next(items, _END)
+                if item is _END:
+                    exhausted = True
+                    break
+                pending[executor.submit(fn, item)] = submitted
+                submitted += 1
+            if next_index == submitted:
+                return
+            while next_index not in finished:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[pending.pop(future)] = future.result()
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+
+def extract_chunks(texts: Iterable[str],
+                   max_workers: int = MAX_CONCURRENCY) -> Iterator[str]:
+    """Run the extraction chain over every chunk with bounded concurrency.
+    
+    Results are yielded in chunk order as soon as they (and every earlier
+    chunk) are ready, so downstream stages can consume them without the
+    whole set ever being held in memory.
+    
+    Args:
+        texts: Chunk contents in document order (may be lazy)
+        max_workers: Maximum number of LLM calls in flight at once
+        
+    Yields:
+        Extraction results, in the same order as ``texts``
+    """
+    for count, result in enumerate(map_ordered(extract_chunk, texts, max_workers), 1):
+        print(f"Processed chunk {count}")
+        yield result
+
+
+REDUCE_SEPARATOR = "\n\n---\n\n"
+
+
+def batch_findings(findings: Iterable[str], budget_tokens: int,
+                   max_items: int = REDUCE_BATCH_SIZE) -> Iterator[str]:
+    """Group findings into summary inputs of at most ``budget_tokens`` tokens.
+    
+    Findings are taken in order and a batch is closed when the next one would
+    push it over the budget or past ``max_items`` entries. A single finding
+    larger than the whole budget is cut down to it.
+    
+    Args:
+        findings: Findings or partial summaries in document order (may be lazy)
+        budget_tokens: Token budget for the joined batch text
+        max_items: Maximum number of findings per batch
+        
+    Yields:
+        Joined batch texts
+    """
+    separator_tokens = count_tokens(REDUCE_SEPARATOR)
+    parts, tokens = [], 0
+    for finding in findings:
+        finding_tokens = count_tokens(finding)
+        if finding_tokens > budget_tokens:
+            encoded = encoding.encode(finding, disallowed_special=())
+            finding = encoding.decode(encoded[:budget_tokens])
+            finding_tokens = budget_tokens
+        added = finding_tokens + (separator_tokens if parts else 0)
+        if parts and (tokens + added > budget_tokens or len(parts) >= max_items):
+            yield REDUCE_SEPARATOR.join(parts)
+            parts, tokens, added = [], 0, finding_tokens
+        parts.append(finding)
+        tokens += added
+    if parts:
+        yield REDUCE_SEPARATOR.join(parts)
+
+
+def reduce_findings(findings: Iterable[str], batch_size: int = REDUCE_BATCH_SIZE,
+                    max_workers: int = MAX_CONCURRENCY) -> str:
+    """Merge per-chunk findings into one report with the summary prompt.
+    
+    Findings are packed into batches that fit the context window (minus the
+    summary template and the output reserve) and the partial summaries are
+    fed back in until a single report remains, so no call overflows the
+    context however long individual findings are. ``findings`` may be a lazy
+    iterator: the first level summarizes batches as they fill, so only the
+    partial summaries are ever held in memory.
+    
+    Args:
+        findings: Per-chunk extraction results in document order
+        batch_size: Maximum number of findings merged per summary call
+        max_workers: Maximum number of summary calls in flight at once
+        
+    Returns:
+        The final executive summary
+    """
+    findings = iter(findings)
+    first = next(findings, None)
+    if first is None:
+        return ""
+    second = next(findings, None)
+    if second is None:
+        return first
+    findings = itertools.chain([first, second], findings)
+    
+    budget_tokens = (CONTEXT_TOKENS - OUTPUT_RESERVE_TOKENS
+                     - count_tokens(summary_prompt.template.replace("{findings}", "")))
+    batch_size = max(2, batch_size)
+    summarize = lambda batch: summary_chain.run({"findings": batch})
+    level = 1
+    while True:
+        summaries = list(map_ordered(
+            summarize, batch_findings(findings, budget_tokens, batch_size), max_workers
+        ))
+        print(f"Reduce level {level}: {len(summaries)} summary call(s)")
+        if len(summaries) == 1:
+            return summaries[0]
+        findings = summaries
+        level += 1
+
+
+class NearDuplicateIndex:
+    """Incremental MinHash/LSH index that flags near-duplicate findings.
+    
+    Each finding is normalized, broken into character shingles and summarized by a
+    MinHash signature. Signatures are bucketed by bands (locality-sensitive
+    hashing), so a new finding is only compared against candidates sharing at
+    least one band instead of against everything seen so far.
+    
+    Example:
+        >>> index = NearDuplicateIndex()
+        >>> index.add("Alice to send the Q3 budget by Friday")
+        True
+        >>> index.add("- Alice to send the Q3 budget by Friday.")
+        False
+    """
+    
+    _PRIME = (1 << 61) - 1
+    
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = 64,
+                 bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME))
+            for _ in range(self.bands * self.rows)
+        ]
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = []
+    
+    def _signature(self, text: str) -> tuple:
+        normalized = " ".join(re.findall(r"\w+", text.lower()))
+        size = min(self.shingle_size, len(normalized)) or 1
+        shingles = {
+            normalized[i:i + size]
+            for i in range(max(1, len(normalized) - size + 1))
+        }
+        hashes = [
+            int.from_bytes(
+                hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big"
+            )
+            for s in shingles
+        ]
+        return tuple(
+            min((a * h + b) % self._PRIME for h in hashes) for a, b in self._perms
+        )
+    
+    def add(self, text: str) -> bool:
+        """Index ``text`` and return False if it near-duplicates an earlier entry."""
+        signature = self._signature(text)
+        bands = [
+            signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)
+        ]
+        candidates = set()
+        for bucket, band in zip(self._buckets, bands):
+            candidates.update(bucket.get(band, ()))
+        for candidate in candidates:
+            other = self._signatures[candidate]
+            matches = sum(x == y for x, y in zip(signature, other))
+            if matches / len(signature) >= self.threshold:
+                return False
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, band in zip(self._buckets, bands):
+            bucket.setdefault(band, []).append(position)
+        return True
+
+
+FINDING_CATEGORIES = {
+    "action_items": re.compile(r"action", re.I),
+    "decisions": re.compile(r"decision", re.I),
+    "questions": re.compile(r"question", re.I),
+}
+_BULLET = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(.*\S)")
+_BOLD_LINE = re.compile(r"^\*\*([^*]+)\*\*:?$")
+_TABLE_SEPARATOR = re.compile(r"^\|?[\s:|-]+\|?$")
+# A list entry only counts as a heading when its text is a section name such
+# as "Action Items", "Key Decisions Made:" or "**Open Questions**"
+_HEADING_ENTRY = re.compile(
+    r"^(?:key\s+|open\s+)?(?:action\s+items?|decisions?|questions?)\b[\w\s,&/()-]*:?$",
+    re.I,
 )
 
+
+def _table_cells(line: str) -> list:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def parse_findings(result: str):
+    """Split one markdown extraction result into categorized items.
+    
+    ``#`` headings and lines that are entirely bold select the category, as
+    do list entries whose text is just a section name (``1. Action Items``).
+    Below a recognised heading, list entries, plain lines and markdown table
+    rows (cells joined with `` | ``, header row skipped) become its items.
+    Everything else, such as sections that are not a finding category, is
+    returned untouched as the remainder so it still reaches the reduce stage.
+    
+    Args:
+        result: Markdown report returned by the extraction chain
+        
+    Returns:
+        Tuple of a dict mapping each key of FINDING_CATEGORIES to a list of
+        items, and the remainder text that was not parsed into items
+    """
+    findings = {category: [] for category in FINDING_CATEGORIES}
+    remainder = []
+    current = None
+    lines = result.splitlines()
+    for position, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        bullet = _BULLET.match(line)
+        label = bullet.group(1) if bullet else stripped
+        bold = _BOLD_LINE.match(label)
+        heading_text = None
+        if stripped.startswith("#"):
+            heading_text = stripped.lstrip("#").strip()
+        elif bold and not bullet:
+            heading_text = bold.group(1)
+        elif _HEADING_ENTRY.match(label.replace("*", "").strip()):
+            heading_text = label
+        
+        if heading_text is not None:
+            current = next(
+                (c for c, pattern in FINDING_CATEGORIES.items()
+                 if pattern.search(heading_text)),
+                None
+            )
+            if current is None:
+                remainder.append(line)
+            continue
+        if current is None:
+            remainder.append(line)
+            continue
+        if stripped.startswith("|"):
+            following = lines[position + 1].strip() if position + 1 < len(lines) else ""
+            if _TABLE_SEPARATOR.match(stripped) or _TABLE_SEPARATOR.match(following):
+                continue
+            label = " | ".join(cell for cell in _table_cells(stripped) if cell)
+        findings[current].append(label)
+    return findings, "\n".join(remainder).strip()
+
+
+# Map: process each chunk concurrently, keeping results in chunk order
+all_action_items = []
+all_decisions = []
+all_questions = []
+
+chunk_stream = stream_chunks(TRANSCRIPT_PATH, text_splitter)
+packing_stats = {}
+if PACK_CHUNKS:
+    template_tokens = count_tokens(extraction_prompt.template.replace("{text}", ""))
+    chunk_stream = pack_chunks(
+        chunk_stream,
+        budget_tokens=CONTEXT_TOKENS - OUTPUT_RESERVE_TOKENS - template_tokens,
+        count_tokens=count_tokens,
+        max_overlap=text_splitter._chunk_overlap,
+        stats=packing_stats
+    )
+
+chunk_results = extract_chunks(c.page_content for c in chunk_stream)
+
+# Parse result into categories, dropping findings repeated by chunk overlap
+dedup_indexes = {category: NearDuplicateIndex() for category in FINDING_CATEGORIES}
+category_lists = {
+    "action_items": all_action_items,
+    "decisions": all_decisions,
+    "questions": all_questions,
+}
+dedup_stats = {"dropped": 0}
+
+
+def unique_findings(results: Iterable[str]) -> Iterator[str]:
+    """Yield each chunk result with findings seen in earlier chunks removed.
+    
+    Only parsed items are deduplicated; text the parser could not attribute to
+    a category is passed through to the reduce stage unchanged.
+    """
+    for result in results:
+        parsed, remainder = parse_findings(result)
+        sections = []
+        for category, items in parsed.items():
+            new_items = [item for item in items if dedup_indexes[category].add(item)]
+            dedup_stats["dropped"] += len(items) - len(new_items)
+            category_lists[category].extend(new_items)
+            if new_items:
+                title = category.replace("_", " ").title()
+                bullets = "\n".join(f"- {i}" for i in new_items)
+                sections.append(f"## {title}\n" + bullets)
+        if remainder:
+            sections.append(remainder)
+        if sections:
+            yield "\n\n".join(sections)
+
+
+# Reduce: results stream from the map stage through deduplication into the
+# first summary level, so the per-chunk results are never all held at once
+final_report = reduce_findings(unique_findings(chunk_results))
+
+if PACK_CHUNKS:
+    saved = packing_stats["segments"] - packing_stats["packed"]
+    print(f"Token packing: {packing_stats['packed']} calls instead of "
+          f"{packing_stats['segments']} fixed-size calls ({saved} saved)")
+
+print(f"Findings: {len(all_action_items)} action items, {len(all_decisions)} "
+      f"decisions, {len(all_questions)} questions "
+      f"({dedup_stats['dropped']} near-duplicates dropped)")
+
+cache_stats = chunk_cache.stats()
+print(f"Chunk cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+      f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['entries']} entries)")
+
 print("\n=== EXTRACTED REPORT ===")
 print(final_report)
 
 if __name__ == "__main__":
     # How to run this code:
-    # 1. pip install langchain openai
+    # 1. pip install langchain openai tiktoken
     # 2. Set your OpenAI API key: os.environ["OPENAI_API_KEY"] = "your-key"
     # 3. Save your transcript as "meeting_transcript.txt"
-    # 4. Run: python 01_langchain_document_extractor.py
+    # 4. Optionally tune EXTRACTOR_MAX_CONCURRENCY / EXTRACTOR_REDUCE_BATCH_SIZE /
+    #    EXTRACTOR_STREAM_WINDOW_BYTES / EXTRACTOR_CACHE_MAX_BYTES
+    #    (cached chunk results are kept in $OUTPUT_DIR/chunk_cache.sqlite)
+    # 5. Set EXTRACTOR_PACK_CHUNKS=True to pack segments up to
+    #    EXTRACTOR_CONTEXT_TOKENS minus EXTRACTOR_OUTPUT_RESERVE_TOKENS
+    # 6. Tune EXTRACTOR_DEDUP_THRESHOLD (0-1) to control how similar two
+    #    findings must be before the later one is dropped
+    # 7. Run: python 01_langchain_document_extractor.py
     
     # Note: You can automate meeting transcripts with tools like Otter.ai or Fireflies.ai
     pass
@@ -4,6 +4,14 @@ AutoGPT - Autonomous Internet Research
 Autonomous agent that pursues goals without continuous human guidance.
 Researches across multiple sources and generates comprehensive reports.
 
+Set AUTOGPT_MODE=dag to decompose the goal into a dependency graph of
+subtasks that run concurrently on a worker pool, followed by a synthesis
+step that writes the final report. The serial loop checkpoints after every
+iteration; run `python 02_autogpt_researcher.py resume` to continue from the
+last good iteration after a crash or rate limit. Tool calls go through a
+shared on-disk result cache, so repeated searches and analyses are served
+without another external call.
+
 Requirements:
 - auto-gpt
 - OpenAI API key
@@ -12,27 +20,408 @@ Author: AI Agents Article Examples
 """
 
 import os
+import sys
 import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from auto_gpt_agent import AutoGPT
 from auto_gpt_tools import SearchTool, FileTool, AnalysisTool
 
+OUTPUT_DIR = os.environ.get("AUTOGPT_OUTPUT_DIR", "./research_output")
+MODE = os.environ.get("AUTOGPT_MODE", "serial")
+MAX_WORKERS = int(os.environ.get("AUTOGPT_MAX_WORKERS", "4"))
+SUBTASK_MAX_ITERATIONS = int(os.environ.get("AUTOGPT_SUBTASK_MAX_ITERATIONS", "15"))
+MAX_ITERATIONS = 50
+CHECKPOINT_PATH = os.path.join(OUTPUT_DIR, "checkpoint.jsonl")
+RESUME = len(sys.argv) > 1 and sys.argv[1] == "resume"
+
+# Tool result cache TTLs in seconds
+TOOL_CACHE_PATH = os.path.join(OUTPUT_DIR, "tool_cache.sqlite")
+SEARCH_CACHE_TTL = int(os.environ.get("AUTOGPT_SEARCH_CACHE_TTL", "86400"))
+ANALYSIS_CACHE_TTL = int(os.environ.get("AUTOGPT_ANALYSIS_CACHE_TTL", "604800"))
+FILE_CACHE_TTL = int(os.environ.get("AUTOGPT_FILE_CACHE_TTL", "300"))
+
 # Configure AutoGPT with your goals
 goal = """Research Tesla's competitive position in the EV market as of 2024.
 Include: market share data, product lineup comparison, pricing strategy,
 technology advantages, and recent news. Create a comprehensive report."""
 
-# Initialize the agent with tools
-agent = AutoGPT(
-    name="MarketResearchAgent",
-    role="Expert market analyst specializing in automotive industry",
-    goals=[goal],
-    tools=[
-        SearchTool(),
-        FileTool(directory="./research_output"),
-        AnalysisTool()
-    ],
-    api_key=os.environ.get("OPENAI_API_KEY")
-)
+# Decomposed subtasks: name -> (goal, names of subtasks whose findings it needs)
+subtasks = {
+    "market_share": (
+        "Collect Tesla's 2024 global and regional EV market share data "
+        "and the share held by its main competitors.", []
+    ),
+    "product_lineup": (
+        "Compare Tesla's 2024 vehicle lineup with competing EV models "
+        "on range, features and segment.", []
+    ),
+    "pricing": (
+        "Analyze Tesla's 2024 pricing strategy, including price cuts, "
+        "against the competing models identified.", ["product_lineup"]
+    ),
+    "technology": (
+        "Assess Tesla's technology advantages in batteries, autonomy, "
+        "charging network and manufacturing.", []
+    ),
+    "news": (
+        "Summarize recent news affecting Tesla's competitive position.", []
+    ),
+}
+
+
+def normalize_query(value):
+    """Canonicalize a tool argument so trivially different calls share a key"""
+    if isinstance(value, str):
+        return " ".join(re.findall(r"[\w$%.+-]+", value.lower())).strip(".")
+    if isinstance(value, dict):
+        return {k: normalize_query(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize_query(v) for v in value]
+    return value
+
+
+class ToolResultCache:
+    """Disk-backed tool result store shared by every agent in the process.
+    
+    Results are kept in SQLite with a per-entry expiry time. Identical calls
+    that arrive while the first one is still executing wait for it and share
+    its result instead of issuing another external request. Every caller gets
+    the JSON round-tripped result (tuples become lists, other objects their
+    ``str``), so a value has the same type whether or not it was cached.
+    """
+    
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tool_results (
+                key TEXT PRIMARY KEY,
+                tool TEXT NOT NULL,
+                result TEXT NOT NULL,
+                expires REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+    
+    def _count(self, tool, field):
+        stats = self._stats.setdefault(tool, {"hits": 0, "shared": 0, "misses": 0})
+        stats[field] += 1
+    
+    def call(self, tool, key, ttl, compute):
+        """Return the cached result for ``key`` or compute and store it.
+        
+        Args:
+            tool: Tool name used for stats and invalidation
+            key: Normalized call key
+            ttl: Seconds the result stays valid
+            compute: Zero-argument function performing the real call
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM tool_results WHERE key = ? AND expires > ?",
+                (key, time.time())
+            ).fetchone()
+            if row is not None:
+                self._count(tool, "hits")
+                return json.loads(row[0])
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = self._inflight[key] = {"event": threading.Event()}
+                owner = True
+                self._count(tool, "misses")
+            else:
+                owner = False
+                self._count(tool, "shared")
+        
+        if not owner:
+            waiter["event"].wait()
+            if "error" in waiter:
+                raise waiter["error"]
+            return waiter["result"]
+        
+        payload = None
+        try:
+            payload = json.dumps(compute(), default=str)
+            waiter["result"] = json.loads(payload)
+        except BaseException as exc:
+            # Waiters must see the failure, even an interrupt, not a KeyError
+            waiter["error"] = exc
+            raise
+        finally:
+            with self._lock:
+                if "result" in waiter:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO tool_results VALUES (?, ?, ?, ?)",
+                        (key, tool, payload, time.time() + ttl)
+                    )
+                    self._conn.commit()
+                del self._inflight[key]
+            waiter["event"].set()
+        return waiter["result"]
+    
+    def invalidate(self, tool):
+        """Drop every stored result of ``tool``"""
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_results WHERE tool = ?", (tool,))
+            self._conn.commit()
+    
+    def report(self):
+        """Return per-tool hits, shared in-flight calls, misses and hit rate"""
+        with self._lock:
+            report = {}
+            for tool, stats in self._stats.items():
+                total = sum(stats.values())
+                saved = stats["hits"] + stats["shared"]
+                report[tool] = dict(stats, hit_rate=saved / total if total else 0.0)
+            return report
+
+
+class CachedTool:
+    """Wrap a tool so selected methods are served through a ToolResultCache.
+    
+    Calls to ``cached_methods`` are cached under the tool's TTL, calls to
+    ``invalidating_methods`` (e.g. FileTool writes) clear the tool's cached
+    entries, and every other attribute is delegated to the wrapped tool.
+    Arguments are keyed exactly unless ``normalize`` is set, which is only
+    safe for free-text queries (paths and analysis inputs are case- and
+    punctuation-sensitive).
+    """
+    
+    def __init__(self, tool, cache, ttl, cached_methods=("run",),
+                 invalidating_methods=(), normalize=False):
+        self._tool = tool
+        self._cache = cache
+        self._ttl = ttl
+        self._normalize = normalize_query if normalize else (lambda value: value)
+        self._name = type(tool).__name__
+        self._cached_methods = set(cached_methods)
+        self._invalidating_methods = set(invalidating_methods)
+    
+    def __getattr__(self, attr):
+        target = getattr(self._tool, attr)
+        if attr in self._cached_methods:
+            def cached(*args, **kwargs):
+                key = json.dumps(
+                    [self._name, attr, self._normalize(list(args)),
+                     self._normalize(kwargs)],
+                    default=str, sort_keys=True
+                )
+                return self._cache.call(
+                    self._name, key, self._ttl, lambda: target(*args, **kwargs)
+                )
+            return cached
+        if attr in self._invalidating_methods:
+            def invalidating(*args, **kwargs):
+                try:
+                    return target(*args, **kwargs)
+                finally:
+                    self._cache.invalidate(self._name)
+            return invalidating
+        return target
+
+
+tool_cache = ToolResultCache(TOOL_CACHE_PATH)
+
+
+def build_agent(name, goals):
+    """Create an AutoGPT agent with the researcher's (cached) toolset"""
+    return AutoGPT(
+        name=name,
+        role="Expert market analyst specializing in automotive industry",
+        goals=goals,
+        tools=[
+            CachedTool(SearchTool(), tool_cache, SEARCH_CACHE_TTL, normalize=True),
+            CachedTool(FileTool(directory=OUTPUT_DIR), tool_cache, FILE_CACHE_TTL,
+                       cached_methods=("read",), invalidating_methods=("write",)),
+            CachedTool(AnalysisTool(), tool_cache, ANALYSIS_CACHE_TTL)
+        ],
+        api_key=os.environ.get("OPENAI_API_KEY")
+    )
+
+
+def run_subtask_dag(subtasks, max_workers=MAX_WORKERS,
+                    max_iterations=SUBTASK_MAX_ITERATIONS):
+    """Run decomposed subtasks concurrently, respecting their dependencies.
+    
+    A subtask is submitted as soon as every subtask it depends on has
+    finished, and receives their findings as context. At most
+    ``max_workers`` agents run at once.
+    
+    Args:
+        subtasks: Mapping of name -> (goal, list of dependency names)
+        max_workers: Global cap on concurrently running agents
+        max_iterations: Iteration budget for each subtask agent
+        
+    Returns:
+        Tuple of (results by name, seconds spent per subtask)
+        
+    Raises:
+        ValueError: If a dependency is unknown or the graph has a cycle
+    """
+    for name, (_, deps) in subtasks.items():
+        unknown = [d for d in deps if d not in subtasks]
+        if unknown:
+            raise ValueError(f"Subtask {name!r} depends on unknown {unknown}")
+    
+    results, durations = {}, {}
+    remaining = dict(subtasks)
+    running = {}
+    
+    def execute(name, task_goal, context):
+        start = time.perf_counter()
+        if context:
+            task_goal += "\n\nFindings from earlier research:\n" + context
+        agent = build_agent(f"MarketResearchAgent-{name}", [task_goal])
+        output = agent.run(max_iterations=max_iterations)
+        return output, time.perf_counter() - start
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while remaining or running:
+            ready = [
+                name for name, (_, deps) in remaining.items()
+                if all(d in results for d in deps)
+            ]
+            for name in ready:
+                task_goal, deps = remaining.pop(name)
+                context = "\n\n".join(f"[{d}]\n{results[d]}" for d in deps)
+                running[executor.submit(execute, name, task_goal, context)] = name
+                print(f"Started subtask: {name}")
+            if not running:
+                raise ValueError(f"Dependency cycle among subtasks: {list(remaining)}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name], durations[name] = future.result()
+                print(f"Finished subtask: {name} ({durations[name]:.1f}s)")
+    return results, durations
+
+
+def synthesize_report(results, max_iterations=SUBTASK_MAX_ITERATIONS):
+    """Combine subtask findings into research_output/final_report.md"""
+    findings = "\n\n".join(f"## {name}\n{text}" for name, text in results.items())
+    agent = build_agent(
+        "MarketResearchAgent-synthesis",
+        [f"{goal}\n\nUse these research findings:\n{findings}"]
+    )
+    report = agent.run(max_iterations=max_iterations)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    report_path = os.path.join(OUTPUT_DIR, "final_report.md")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(str(report))
+    return report
+
+
+class CheckpointJournal:
+    """Append-only, crash-safe journal of agent iterations.
+    
+    Each record is one line, ``<crc32> <json>``, written with a single
+    ``os.write`` on an ``O_APPEND`` descriptor and fsynced. A crash can at
+    worst leave a torn last line; its checksum will not match, so ``load``
+    drops it and truncates the file back to the last good record.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    
+    def load(self):
+        """Return every intact record, discarding a torn tail if present."""
+        records, good_bytes = [], 0
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    checksum, payload = line.rstrip(b"\n").split(b" ", 1)
+                    intact = line.endswith(b"\n")
+                    if not intact or int(checksum, 16) != zlib.crc32(payload):
+                        break
+                    records.append(json.loads(payload))
+                except ValueError:
+                    break
+                good_bytes += len(line)
+        if good_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_bytes)
+        return records
+    
+    def append(self, record):
+        """Durably append one record."""
+        payload = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+        line = b"%08x %s\n" % (zlib.crc32(payload), payload)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def reset(self):
+        """Start a fresh journal for a new run."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run_with_checkpoints(agent, max_iterations, journal, resume=False):
+    """Run the agent one iteration at a time, checkpointing after each.
+    
+    Only the memory entries and completed steps added during an iteration are
+    stored, together with that iteration's tool output, which keeps the
+    journal compact. When the agent reports it is done, a terminal record
+    is appended. On resume the records are replayed into the agent and the
+    loop continues after the last good iteration, or returns the final
+    output straight away if the journal holds a terminal record.
+    
+    Args:
+        agent: AutoGPT agent to drive
+        max_iterations: Total iteration budget, including resumed ones
+        journal: CheckpointJournal to write to
+        resume: Restore state from the journal instead of starting over
+        
+    Returns:
+        Output of the last iteration
+    """
+    memory, steps, output, start = [], [], None, 0
+    if resume:
+        for record in journal.load():
+            if record.get("done"):
+                print("Journal records a finished run; returning its final output")
+                return record["output"]
+            memory.extend(record["memory"])
+            steps.extend(record["steps"])
+            output = record["output"]
+            start = record["iteration"] + 1
+        agent.memory = list(memory)
+        agent.completed_steps = list(steps)
+        print(f"Resuming from iteration {start}/{max_iterations}")
+    else:
+        journal.reset()
+    
+    for iteration in range(start, max_iterations):
+        output = agent.run(max_iterations=1)
+        new_memory = list(getattr(agent, "memory", []))[len(memory):]
+        new_steps = list(getattr(agent, "completed_steps", []))[len(steps):]
+        memory.extend(new_memory)
+        steps.extend(new_steps)
+        journal.append({
+            "iteration": iteration,
+            "memory": new_memory,
+            "steps": new_steps,
+            "output": output,
+        })
+        if getattr(agent, "is_done", False):
+            journal.append({"done": True, "iteration": iteration, "output": output})
+            break
+    return output
+
 
 # The agent will autonomously:
 # 1. Break down the research goal into subtasks
@@ -41,15 +430,43 @@ agent = AutoGPT(
 # 4. Compile findings into a structured report
 # 5. Save results to local files
 
-result = agent.run(max_iterations=50)
+if MODE == "dag":
+    start = time.perf_counter()
+    subtask_results, subtask_durations = run_subtask_dag(subtasks)
+    synthesis_start = time.perf_counter()
+    result = synthesize_report(subtask_results)
+    synthesis_time = time.perf_counter() - synthesis_start
+    elapsed = time.perf_counter() - start
+    serial_time = sum(subtask_durations.values()) + synthesis_time
+    print(f"DAG run: {elapsed:.1f}s wall clock vs {serial_time:.1f}s if run "
+          f"serially ({serial_time - elapsed:.1f}s saved)")
+    with open(os.path.join(OUTPUT_DIR, "dag_timings.json"), "w") as f:
+        json.dump({"subtasks": subtask_durations, "synthesis": synthesis_time,
+                   "wall_clock": elapsed, "serial_estimate": serial_time}, f, indent=2)
+else:
+    # Initialize the agent with tools
+    agent = build_agent("MarketResearchAgent", [goal])
+    result = run_with_checkpoints(
+        agent, MAX_ITERATIONS, CheckpointJournal(CHECKPOINT_PATH), resume=RESUME
+    )
+
+for tool_name, stats in tool_cache.report().items():
+    print(f"{tool_name}: {stats['hits']} cache hits, {stats['shared']} shared "
+          f"in-flight, {stats['misses']} external calls "
+          f"({stats['hit_rate']:.0%} saved)")
 
 print("Research complete!")
-print(f"Output saved to: ./research_output/final_report.md")
+print(f"Output saved to: {OUTPUT_DIR}/final_report.md")
 
 if __name__ == "__main__":
     # How to run this code:
     # 1. pip install auto-gpt
     # 2. Set your API key in environment variables
     # 3. Configure goals in the code above
-    # 4. Run: python 02_autogpt_researcher.py
+    # 4. Optionally set AUTOGPT_MODE=dag (with AUTOGPT_MAX_WORKERS and
+    #    AUTOGPT_SUBTASK_MAX_ITERATIONS) to run subtasks in parallel
+    # 5. Tune tool cache TTLs with AUTOGPT_SEARCH_CACHE_TTL,
+    #    AUTOGPT_ANALYSIS_CACHE_TTL and AUTOGPT_FILE_CACHE_TTL (seconds)
+    # 6. Run: python 02_autogpt_researcher.py
+    # 7. After a crash, continue with: python 02_autogpt_researcher.py resume
     pass
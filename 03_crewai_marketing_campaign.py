@@ -4,20 +4,379 @@ CrewAI - Multi-Agent Marketing Strategy Meeting
 Multi-agent collaboration where different agents with specialized roles
 work together on complex tasks like marketing campaigns.
 
+Set CREWAI_PARALLEL=True to have each task declare the outputs it consumes
+(``context``) so tasks whose inputs are ready run concurrently, while
+``crew.kickoff()`` still returns the final channel strategy.
+
+All agents share one pooled HTTP client whose transport enforces shared
+requests/min and tokens/min budgets and retries 429s with jittered backoff
+that honors ``Retry-After``. Run `python 03_crewai_marketing_campaign.py
+mock-429` to exercise it against a local mock server that injects 429s.
+
+``stream_kickoff`` runs the crew in the background and yields task start,
+token and task finish events as they happen, recording time-to-first-token
+and latency per task.
+
 Requirements:
 - crewai
 - langchain
 - openai
+- httpx
 - OpenAI API key
 
 Author: AI Agents Article Examples
 """
 
+import os
+import sys
+import json
+import random
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
 from crewai import Agent, Task, Crew, Process
 from langchain.llms import OpenAI
+from langchain.callbacks.base import BaseCallbackHandler
+
+PARALLEL = os.environ.get("CREWAI_PARALLEL", "False").lower() == "true"
+STREAM = os.environ.get("CREWAI_STREAM", "True").lower() == "true"
+
+# Shared rate limits for every agent and crew in this process
+REQUESTS_PER_MINUTE = int(os.environ.get("OPENAI_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = int(os.environ.get("OPENAI_TOKENS_PER_MINUTE", "40000"))
+MAX_RETRIES = int(os.environ.get("MAX_RETRIES", "3"))
+RETRY_DELAY = float(os.environ.get("RETRY_DELAY", "1"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate_per_minute``.
+    
+    ``acquire`` blocks until enough capacity is available. ``pause`` stops
+    all callers until a deadline, which is used when the server answers 429
+    so every agent backs off together instead of piling on retries.
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self, amount: float = 1.0):
+        """Block until ``amount`` tokens can be taken from the bucket"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = max(
+                    self._paused_until - now, (amount - self._tokens) / self.rate
+                )
+            time.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Hold every caller for at least ``seconds``"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport adding shared rate limiting and 429 backoff.
+    
+    Wraps a keep-alive connection pool. Before each request it takes one
+    token from the request bucket and an estimated token count (prompt
+    characters / 4 plus ``max_tokens``) from the token bucket. On 429 or 5xx
+    it waits for ``Retry-After`` (or an exponential delay) plus jitter, pausing
+    the shared buckets, and retries up to ``max_retries`` times.
+    """
+    
+    def __init__(self, request_bucket: TokenBucket, token_bucket: TokenBucket,
+                 max_retries: int = MAX_RETRIES, base_delay: float = RETRY_DELAY,
+                 max_connections: int = 20):
+        self.request_bucket = request_bucket
+        self.token_bucket = token_bucket
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+        self._stats_lock = threading.Lock()
+        self._transport = httpx.HTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60
+            )
+        )
+    
+    @staticmethod
+    def estimate_tokens(request: httpx.Request) -> int:
+        try:
+            body = json.loads(request.content or b"{}")
+        except ValueError:
+            return 1
+        prompt = json.dumps(body.get("messages") or body.get("prompt") or "")
+        return len(prompt) // 4 + int(body.get("max_tokens") or 256)
+    
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        retry_after_ms = response.headers.get("retry-after-ms")
+        retry_after = response.headers.get("retry-after")
+        try:
+            if retry_after_ms is not None:
+                delay = float(retry_after_ms) / 1000
+            elif retry_after is not None:
+                delay = float(retry_after)
+            else:
+                delay = self.base_delay * (2 ** attempt)
+        except ValueError:
+            delay = self.base_delay * (2 ** attempt)
+        return delay + random.uniform(0, delay * 0.25 + 0.05)
+    
+    def _count(self, field):
+        with self._stats_lock:
+            self.stats[field] += 1
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = self.estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(tokens)
+            self._count("requests")
+            response = self._transport.handle_request(request)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == self.max_retries:
+                return response
+            response.read()
+            response.close()
+            delay = self._retry_delay(response, attempt)
+            if response.status_code == 429:
+                self._count("throttled")
+                self.request_bucket.pause(delay)
+            self._count("retries")
+            time.sleep(delay)
+        return response
+    
+    def close(self):
+        self._transport.close()
+
+
+def create_pooled_client(requests_per_minute: int = REQUESTS_PER_MINUTE,
+                         tokens_per_minute: int = TOKENS_PER_MINUTE) -> httpx.Client:
+    """Build an httpx client with a shared, rate-limited connection pool"""
+    transport = RateLimitedTransport(
+        TokenBucket(requests_per_minute), TokenBucket(tokens_per_minute)
+    )
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(120.0))
+
+
+def run_mock_429_demo(requests: int = 40, throttle_every: int = 3, workers: int = 8):
+    """Fire concurrent completions at a local server that injects 429s.
+    
+    Every ``throttle_every``-th request gets ``429`` with ``Retry-After``.
+    Prints retries, throttles and wall-clock time so the limiter and backoff
+    can be checked without an OpenAI account.
+    """
+    counter = {"n": 0}
+    lock = threading.Lock()
+    
+    class MockOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                counter["n"] += 1
+                throttled = counter["n"] % throttle_every == 0
+            if throttled:
+                body = b'{"error": {"message": "Rate limit reached"}}'
+                self.send_response(429)
+                self.send_header("Retry-After", "0.2")
+            else:
+                body = json.dumps({
+                    "choices": [{"text": "ok", "index": 0, "finish_reason": "stop"}],
+                    "usage": {"total_tokens": 10}
+                }).encode()
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/completions"
+    transport = RateLimitedTransport(TokenBucket(600), TokenBucket(600000))
+    client = httpx.Client(transport=transport)
+    payload = {"model": "gpt-4", "prompt": "Say ok", "max_tokens": 5}
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        statuses = list(executor.map(
+            lambda _: client.post(url, json=payload).status_code, range(requests)
+        ))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    
+    stats = transport.stats
+    print(f"{statuses.count(200)}/{requests} succeeded in {elapsed:.2f}s | "
+          f"{stats['requests']} HTTP calls, {stats['throttled']} throttled, "
+          f"{stats['retries']} retries")
+    client.close()
+
+
+if len(sys.argv) > 1 and sys.argv[1] == "mock-429":
+    run_mock_429_demo()
+    sys.exit(0)
+
+
+class KickoffEventBus:
+    """Collects crew progress events and per-task timing.
+    
+    LLM callbacks and CrewAI's task callback run on worker threads; events
+    are handed to the asyncio queue of the active ``stream_kickoff`` call
+    with ``call_soon_threadsafe``. A task starts with its agent's first LLM
+    call and finishes when CrewAI reports its output.
+    """
+    
+    def __init__(self):
+        self.metrics = []
+        self._active = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._queue = None
+    
+    def attach(self, loop, queue):
+        self._loop, self._queue = loop, queue
+    
+    def detach(self):
+        self._loop = self._queue = None
+    
+    def emit(self, event):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+    
+    def llm_started(self, agent):
+        with self._lock:
+            if agent in self._active:
+                return
+            self._active[agent] = {"start": time.perf_counter(), "first_token": None}
+        self.emit({"type": "task_start", "agent": agent})
+    
+    def token(self, agent, text):
+        with self._lock:
+            state = self._active.get(agent)
+            if state is not None and state["first_token"] is None:
+                state["first_token"] = time.perf_counter()
+        self.emit({"type": "token", "agent": agent, "text": text})
+    
+    def task_finished(self, output):
+        agent = str(getattr(output, "agent", ""))
+        now = time.perf_counter()
+        with self._lock:
+            state = self._active.pop(agent, None) or {"start": now, "first_token": None}
+        metric = {
+            "agent": agent,
+            "task": str(getattr(output, "description", "")).strip().split("\n")[0],
+            "time_to_first_token": (
+                state["first_token"] - state["start"] if state["first_token"] else None
+            ),
+            "latency": now - state["start"],
+        }
+        self.metrics.append(metric)
+        self.emit(dict(metric, type="task_end",
+                       output=getattr(output, "raw", None) or str(output)))
+
+
+class AgentStreamHandler(BaseCallbackHandler):
+    """Forwards one agent's LLM start and token callbacks to the event bus"""
+    
+    def __init__(self, bus, agent):
+        self.bus = bus
+        self.agent = agent
+    
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.bus.llm_started(self.agent)
+    
+    def on_llm_new_token(self, token, **kwargs):
+        self.bus.token(self.agent, token)
+
+
+async def stream_kickoff(crew, bus):
+    """Run ``crew.kickoff()`` in a worker thread and yield its events.
+    
+    Yields dicts with ``type`` ``task_start``, ``token``, ``task_end`` and
+    finally ``crew_end``, whose ``result`` is exactly what ``kickoff()``
+    returned.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    bus.attach(loop, queue)
+    
+    def run():
+        try:
+            result = crew.kickoff()
+            event = {"type": "crew_end", "result": result}
+        except Exception as exc:
+            event = {"type": "crew_error", "error": exc}
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+    
+    worker = loop.run_in_executor(None, run)
+    try:
+        while True:
+            event = await queue.get()
+            if event["type"] == "crew_error":
+                raise event["error"]
+            yield event
+            if event["type"] == "crew_end":
+                break
+    finally:
+        await worker
+        bus.detach()
+
+
+async def print_streamed_kickoff(crew, bus):
+    """Print crew progress as it streams in and return the kickoff result"""
+    current_agent = None
+    async for event in stream_kickoff(crew, bus):
+        if event["type"] == "task_start":
+            print(f"\n--- {event['agent']} started ---")
+        elif event["type"] == "token":
+            if event["agent"] != current_agent:
+                current_agent = event["agent"]
+                print(f"\n[{current_agent}] ", end="")
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "task_end":
+            print(f"\n--- {event['agent']} finished in {event['latency']:.1f}s ---")
+        elif event["type"] == "crew_end":
+            return event["result"]
+
+
+# Initialize the language models on the shared, rate-limited client; retries
+# are handled by the transport, so the SDK's own retries are disabled. Each
+# agent gets its own instance so streamed tokens can be attributed to it.
+http_client = create_pooled_client()
+event_bus = KickoffEventBus()
+
+
+def make_llm(agent_role):
+    return OpenAI(
+        model="gpt-4", temperature=0.7, http_client=http_client, max_retries=0,
+        streaming=STREAM, callbacks=[AgentStreamHandler(event_bus, agent_role)]
+    )
 
-# Initialize the language model
-llm = OpenAI(model="gpt-4", temperature=0.7)
 
 # Define specialized marketing agents
 market_researcher = Agent(
@@ -26,7 +385,7 @@ market_researcher = Agent(
     backstory="""You are an experienced market researcher who has 
     worked with Fortune 500 companies to launch successful products.
     You excel at data analysis and trend identification.""",
-    llm=llm,
+    llm=make_llm("Market Research Specialist"),
     verbose=True
 )
 
@@ -36,7 +395,7 @@ creative_director = Agent(
     backstory="""You have 15 years of experience in advertising,
     having created campaigns for major brands. You have a gift
     for finding the emotional core of any product.""",
-    llm=llm,
+    llm=make_llm("Creative Director"),
     verbose=True
 )
 
@@ -46,7 +405,7 @@ channel_strategist = Agent(
     backstory="""You are a digital marketing veteran who understands
     the nuances of every platform from LinkedIn to TikTok.
     You know which messages work where.""",
-    llm=llm,
+    llm=make_llm("Digital Channel Strategist"),
     verbose=True
 )
 
@@ -57,35 +416,83 @@ research_task = Task(
     agent=market_researcher
 )
 
-creative_task = Task(
-    description="Develop brand messaging and creative concepts",
-    expected_output="Campaign brief with messaging framework",
-    agent=creative_director
-)
-
-channel_task = Task(
-    description="Create a multi-channel marketing plan",
-    expected_output="Detailed channel strategy document",
-    agent=channel_strategist
-)
+if PARALLEL:
+    # Each task consumes only the outputs listed in its context. Async tasks
+    # start as soon as their context is ready, so the creative brief and the
+    # channel research scaffolding are produced side by side after the market
+    # research, and the final channel plan waits for both.
+    creative_task = Task(
+        description="Develop brand messaging and creative concepts",
+        expected_output="Campaign brief with messaging framework",
+        agent=creative_director,
+        context=[research_task],
+        async_execution=True
+    )
+    
+    channel_research_task = Task(
+        description="""Map candidate channels, audience reach, costs and
+        benchmarks for the target customers (creative-independent groundwork)""",
+        expected_output="Channel research notes with audience and cost benchmarks",
+        agent=channel_strategist,
+        context=[research_task],
+        async_execution=True
+    )
+    
+    channel_task = Task(
+        description="""Create a multi-channel marketing plan, refining the
+        channel research with the campaign brief's messaging""",
+        expected_output="Detailed channel strategy document",
+        agent=channel_strategist,
+        context=[research_task, creative_task, channel_research_task]
+    )
+    
+    tasks = [research_task, creative_task, channel_research_task, channel_task]
+else:
+    creative_task = Task(
+        description="Develop brand messaging and creative concepts",
+        expected_output="Campaign brief with messaging framework",
+        agent=creative_director
+    )
+    
+    channel_task = Task(
+        description="Create a multi-channel marketing plan",
+        expected_output="Detailed channel strategy document",
+        agent=channel_strategist
+    )
+    
+    tasks = [research_task, creative_task, channel_task]
 
 # Assemble the crew
 crew = Crew(
     agents=[market_researcher, creative_director, channel_strategist],
-    tasks=[research_task, creative_task, channel_task],
+    tasks=tasks,
     process=Process.sequential,
+    task_callback=event_bus.task_finished,
     verbose=True
 )
 
 # Execute the collaborative marketing project
-result = crew.kickoff()
+if STREAM:
+    result = asyncio.run(print_streamed_kickoff(crew, event_bus))
+else:
+    result = crew.kickoff()
+
+print("\n=== TASK TIMINGS ===")
+for metric in event_bus.metrics:
+    ttft = metric["time_to_first_token"]
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    print(f"{metric['agent']}: first token {ttft_text}, total {metric['latency']:.1f}s")
 
 print("\n=== MARKETING CAMPAIGN OUTPUT ===")
 print(result)
 
 if __name__ == "__main__":
     # How to run this code:
-    # 1. pip install crewai langchain openai
+    # 1. pip install crewai langchain openai httpx
     # 2. Set OPENAI_API_KEY in your environment
-    # 3. Run: python 03_crewai_marketing_campaign.py
+    # 3. Optionally set CREWAI_PARALLEL=True for dependency-aware scheduling
+    # 4. Set OPENAI_REQUESTS_PER_MINUTE / OPENAI_TOKENS_PER_MINUTE to your tier
+    # 5. Set CREWAI_STREAM=False to disable token streaming
+    # 6. Run: python 03_crewai_marketing_campaign.py
+    # 7. Test the limiter offline: python 03_crewai_marketing_campaign.py mock-429
     pass
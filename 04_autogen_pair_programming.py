@@ -4,48 +4,741 @@ Microsoft AutoGen - Coding Assistant and Debugging
 Multi-agent dialogue system where agents collaborate on complex problems.
 Perfect for pair programming and code review workflows.
 
+With history compaction enabled, each agent only re-sends the latest code
+version verbatim plus a running digest of superseded drafts and resolved
+review comments, capped at a configurable token ceiling.
+
+Generated code and tests run in a pool of warm sandbox workers: each worker
+preloads the stdlib modules and pytest once, then forks a fresh, resource
+limited child per run, so verification skips interpreter start-up and
+several candidates can be checked in parallel. Workers get a minimal
+environment (no API keys), and each child runs without network access, with
+home and project directories hidden and without root privileges (Linux
+only; jobs are refused if that isolation cannot be set up).
+
+Every coder/reviewer call is routed across the endpoints in AUTOGEN_ENDPOINTS
+(e.g. several local OpenAI-compatible servers) by latency, error rate and
+load, with a hedged second request when the chosen endpoint is slow.
+``write_feature_requests`` runs many sessions at once across that pool.
+
 Requirements:
 - pyautogen
+- pytest
 - OpenAI API key
 
 Author: AI Agents Article Examples
 """
 
 import os
+import re
+import sys
+import copy
+import json
+import queue
+import asyncio
+import tempfile
+import threading
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from types import SimpleNamespace
+from openai import OpenAI
 from autogen import AssistantAgent, UserProxyAgent, GroupChat, GroupChatManager
 from autogen.agentchat.contrib.gpt_assistant import GPTAssistantAgent
+from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+from autogen.token_count_utils import count_token
+from autogen.coding import CodeResult, MarkdownCodeExtractor
 
-# Configure the coding agents
-config_list = [{"model": "gpt-4", "api_key": os.environ.get("OPENAI_API_KEY")}]
+# Configure the coding agents. AUTOGEN_ENDPOINTS may hold a JSON list of
+# config entries (model, base_url, api_key) that the router spreads calls over.
+endpoint_configs = json.loads(os.environ.get("AUTOGEN_ENDPOINTS") or "null") or [
+    {"model": "gpt-4", "api_key": os.environ.get("OPENAI_API_KEY")}
+]
+config_list = [
+    {"model": endpoint_configs[0]["model"], "model_client_cls": "RoutedModelClient"}
+]
 
-# The code writer agent
-coder = AssistantAgent(
-    name="SeniorCoder",
-    system_message="""You are a senior software engineer who writes 
-    clean, well-documented Python code. You follow best practices,
-    include comprehensive docstrings, and handle edge cases.""",
-    llm_config={"config_list": config_list}
-)
+# Routing settings
+HEDGE_FACTOR = float(os.environ.get("AUTOGEN_HEDGE_FACTOR", "2.0"))
+MIN_HEDGE_DELAY = float(os.environ.get("AUTOGEN_MIN_HEDGE_DELAY", "2.0"))
+BATCH_PARALLEL = int(os.environ.get("AUTOGEN_BATCH_PARALLEL", "4"))
+LATENCY_PRIOR = float(os.environ.get("AUTOGEN_LATENCY_PRIOR", "5.0"))
+MAX_ERROR_RATE = float(os.environ.get("AUTOGEN_MAX_ERROR_RATE", "0.5"))
+ENDPOINT_COOLDOWN = float(os.environ.get("AUTOGEN_ENDPOINT_COOLDOWN", "30"))
+
+# History compaction settings
+COMPACT_HISTORY = os.environ.get("AUTOGEN_COMPACT_HISTORY", "True").lower() == "true"
+HISTORY_MAX_TOKENS = int(os.environ.get("AUTOGEN_HISTORY_MAX_TOKENS", "6000"))
 
-# The code reviewer agent
-reviewer = AssistantAgent(
-    name="CodeReviewer",
-    system_message="""You are a meticulous code reviewer who catches
-    bugs, performance issues, security vulnerabilities, and style 
-    violations. You suggest specific improvements with code examples.""",
-    llm_config={"config_list": config_list}
+# Sandbox execution settings
+SANDBOX_WORKERS = int(os.environ.get("AUTOGEN_SANDBOX_WORKERS", "4"))
+SANDBOX_TIMEOUT = int(os.environ.get("AUTOGEN_SANDBOX_TIMEOUT", "30"))
+SANDBOX_MEMORY_MB = int(os.environ.get("AUTOGEN_SANDBOX_MEMORY_MB", "512"))
+SANDBOX_ALLOW_SHELL = (
+    os.environ.get("AUTOGEN_SANDBOX_ALLOW_SHELL", "False").lower() == "true"
+)
+SANDBOX_ALLOW_UNISOLATED = (
+    os.environ.get("AUTOGEN_SANDBOX_ALLOW_UNISOLATED", "False").lower() == "true"
 )
+SHELL_LANGUAGES = ("sh", "bash", "shell")
+
+CODE_BLOCK = re.compile(r"```[\w+-]*\n.*?```", re.S)
+DEFINITION = re.compile(r"^\s*(?:def|class)\s+(\w+)", re.M)
+
+
+class HistoryCompactor:
+    """AutoGen message transform that compacts the chat history.
+    
+    The original task (the first non-system message) and the newest message
+    containing a code block, with everything after it, are kept verbatim.
+    Earlier turns (superseded drafts and the review comments they already
+    addressed) are folded into one digest message: prose is cut to
+    ``digest_chars`` characters and code is replaced by a note naming the
+    functions and classes it defined. If the result still exceeds
+    ``max_tokens``, the oldest digest lines are dropped first, then the
+    messages after the latest code are reduced to digest lines and then
+    truncated, newest first. Only if that is not enough is the latest code,
+    and finally the task, truncated, so the ceiling always holds.
+    """
+    
+    def __init__(self, max_tokens=HISTORY_MAX_TOKENS, model="gpt-4", digest_chars=300):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.digest_chars = digest_chars
+        self.tokens_before = 0
+        self.tokens_after = 0
+    
+    @property
+    def tokens_saved(self):
+        return self.tokens_before - self.tokens_after
+    
+    def _summarize(self, message):
+        content = message.get("content")
+        if not isinstance(content, str):
+            return None
+        names = [n for block in CODE_BLOCK.findall(content)
+                 for n in DEFINITION.findall(block)]
+        prose = " ".join(CODE_BLOCK.sub(" ", content).split())
+        if len(prose) > self.digest_chars:
+            prose = prose[:self.digest_chars].rsplit(" ", 1)[0] + " ..."
+        if CODE_BLOCK.search(content):
+            prose += f" [superseded code{': ' + ', '.join(names) if names else ''}]"
+        speaker = message.get("name") or message.get("role", "agent")
+        return f"- {speaker}: {prose.strip()}"
+    
+    def _count(self, messages):
+        return count_token(messages, self.model)
+    
+    def apply_transform(self, messages):
+        before = self._count(messages)
+        latest_code = max(
+            (i for i, m in enumerate(messages)
+             if isinstance(m.get("content"), str) and CODE_BLOCK.search(m["content"])),
+            default=None
+        )
+        if latest_code is None:
+            compacted = copy.deepcopy(messages)
+        else:
+            head = [m for m in messages[:latest_code] if m.get("role") == "system"]
+            older = [m for m in messages[:latest_code] if m.get("role") != "system"]
+            # The task stays pinned; only the turns after it are digested
+            head += older[:1]
+            tail = copy.deepcopy(messages[latest_code:])
+            digest = [line for line in map(self._summarize, older[1:]) if line]
+            
+            def build(lines):
+                if not lines:
+                    return copy.deepcopy(head) + tail
+                note = {"role": "user", "content":
+                        "Digest of earlier turns (superseded drafts and resolved "
+                        "review comments):\n" + "\n".join(lines)}
+                return copy.deepcopy(head) + [note] + tail
+            
+            compacted = build(digest)
+            while digest and self._count(compacted) > self.max_tokens:
+                digest.pop(0)
+                compacted = build(digest)
+            # The verbatim tail alone can exceed the ceiling: condense, then
+            # cut, the messages after the latest code (newest first), and
+            # only then the code itself and the pinned task
+            later = tail[:0:-1]
+            for message in later:
+                if self._count(compacted) <= self.max_tokens:
+                    break
+                summary = self._summarize(message)
+                if summary and not message.get("tool_calls"):
+                    message["content"] = summary[2:]
+                    compacted = build(digest)
+            targets = later + [tail[0]]
+            if older:
+                targets.append(compacted[len(head) - 1])
+            for message in targets:
+                self._truncate(compacted, message)
+        
+        after = self._count(compacted)
+        self.tokens_before += before
+        self.tokens_after += after
+        return compacted
+    
+    def _truncate(self, messages, message):
+        """Cut ``message``'s text until ``messages`` fits max_tokens"""
+        marker = "\n[... truncated to fit the history limit]"
+        for _ in range(8):
+            total = self._count(messages)
+            content = message.get("content")
+            if total <= self.max_tokens or not isinstance(content, str) or not content:
+                break
+            body = content[:-len(marker)] if content.endswith(marker) else content
+            ratio = max(0.0, 1 - (total - self.max_tokens) / total)
+            keep = int(len(body) * ratio * 0.9)
+            message["content"] = body[:keep] + marker
+            if not keep:
+                break
+    
+    def get_logs(self, pre_transform_messages, post_transform_messages):
+        before = self._count(pre_transform_messages)
+        after = self._count(post_transform_messages)
+        if after < before:
+            return f"Compacted history from {before} to {after} tokens.", True
+        return "", False
+
+
+class EndpointStats:
+    """Live health of one endpoint: EWMA latency and error rate, in-flight calls"""
+    
+    def __init__(self, config, alpha=0.2):
+        self.config = config
+        self.name = config.get("base_url") or "api.openai.com"
+        self.client = OpenAI(
+            api_key=config.get("api_key") or os.environ.get("OPENAI_API_KEY"),
+            base_url=config.get("base_url"),
+            max_retries=0
+        )
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.last_call = 0.0
+    
+    def available(self, now, max_error_rate=MAX_ERROR_RATE, cooldown=ENDPOINT_COOLDOWN):
+        """False while the endpoint is failing, except for a probe per cooldown"""
+        return self.error_rate <= max_error_rate or now - self.last_call >= cooldown
+    
+    def score(self, prior, error_penalty=10.0):
+        # Unmeasured endpoints use the prior (the pool's typical latency), and
+        # errors scale the score so a failing endpoint can never look fast
+        latency = self.latency if self.latency is not None else prior
+        return latency * (1 + self.in_flight) * (1 + error_penalty * self.error_rate)
+    
+    def record(self, seconds, ok):
+        self.calls += 1
+        self.last_call = time.monotonic()
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.latency = seconds if self.latency is None else (
+                self.latency + self.alpha * (seconds - self.latency)
+            )
+
+
+class LatencyRouter:
+    """Routes chat completions to the healthiest endpoint, hedging slow calls.
+    
+    The primary request goes to the endpoint with the best score. If it has
+    not answered after ``HEDGE_FACTOR`` times its EWMA latency (the pool's
+    latency prior until it has been measured; at least ``MIN_HEDGE_DELAY``
+    seconds), the same request is also sent to the next
+    best endpoint and whichever succeeds first wins. A failed request fails
+    over to the next best endpoint not tried yet; endpoints whose error rate
+    is above ``MAX_ERROR_RATE`` are skipped while healthier ones exist.
+    """
+    
+    def __init__(self, configs, hedge_factor=HEDGE_FACTOR,
+                 min_hedge_delay=MIN_HEDGE_DELAY):
+        self.endpoints = [EndpointStats(c) for c in configs]
+        self.hedge_factor = hedge_factor
+        self.min_hedge_delay = min_hedge_delay
+        self.hedges = 0
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=8 * len(self.endpoints) + 8)
+    
+    def _prior(self):
+        """Median measured latency of the pool, or LATENCY_PRIOR (hold _lock)"""
+        measured = sorted(e.latency for e in self.endpoints if e.latency is not None)
+        return measured[len(measured) // 2] if measured else LATENCY_PRIOR
+    
+    def _pick(self, exclude=()):
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+            now = time.monotonic()
+            candidates = [e for e in candidates if e.available(now)] or candidates
+            prior = self._prior()
+            endpoint = min(candidates, key=lambda e: e.score(prior))
+            endpoint.in_flight += 1
+            return endpoint
+    
+    def _call(self, endpoint, params):
+        start = time.perf_counter()
+        ok = False
+        try:
+            model = endpoint.config.get("model", params.get("model"))
+            request = dict(params, model=model)
+            response = endpoint.client.chat.completions.create(**request)
+            ok = True
+            return response
+        finally:
+            with self._lock:
+                endpoint.in_flight -= 1
+                endpoint.record(time.perf_counter() - start, ok)
+    
+    def create(self, params):
+        tried = []
+        futures = {}
+        
+        def launch():
+            endpoint = self._pick(exclude=tried)
+            if endpoint is not None:
+                tried.append(endpoint)
+                futures[self._pool.submit(self._call, endpoint, params)] = endpoint
+            return endpoint
+        
+        primary = launch()
+        with self._lock:
+            expected = primary.latency if primary.latency is not None else self._prior()
+        hedge_at = time.monotonic() + max(
+            self.min_hedge_delay, self.hedge_factor * expected
+        )
+        hedged = False
+        error = None
+        while futures:
+            timeout = None if hedged else max(0.0, hedge_at - time.monotonic())
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                if launch() is not None:
+                    with self._lock:
+                        self.hedges += 1
+                continue
+            for future in done:
+                del futures[future]
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+                if launch() is not None:
+                    with self._lock:
+                        self.failovers += 1
+        raise error
+    
+    def report(self):
+        """Return per-endpoint latency, error rate and call counts"""
+        with self._lock:
+            return [
+                {"endpoint": e.name, "calls": e.calls, "ewma_latency": e.latency,
+                 "error_rate": e.error_rate}
+                for e in self.endpoints
+            ]
+
+
+router = LatencyRouter(endpoint_configs)
+
+# Chat completion parameters forwarded to the endpoints
+_COMPLETION_PARAMS = {
+    "messages", "model", "temperature", "top_p", "max_tokens", "stop", "n",
+    "tools", "tool_choice", "functions", "function_call", "seed",
+    "response_format", "presence_penalty", "frequency_penalty",
+}
+
+
+class RoutedModelClient:
+    """AutoGen custom model client that sends every call through ``router``"""
+    
+    def __init__(self, config, **kwargs):
+        self.config = config
+    
+    def create(self, params):
+        request = {k: v for k, v in params.items() if k in _COMPLETION_PARAMS}
+        return router.create(request)
+    
+    def message_retrieval(self, response):
+        return [
+            choice.message if choice.message.tool_calls or choice.message.function_call
+            else choice.message.content
+            for choice in response.choices
+        ]
+    
+    def cost(self, response):
+        return 0.0
+    
+    @staticmethod
+    def get_usage(response):
+        usage = response.usage or SimpleNamespace(
+            prompt_tokens=0, completion_tokens=0, total_tokens=0
+        )
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+            "cost": 0.0,
+            "model": response.model,
+        }
+
+
+# Source of a warm sandbox worker. It imports the heavy modules once, then for
+# every job read from stdin forks a child that isolates itself (new network
+# and mount namespaces, hidden home/project directories, privileges dropped),
+# applies CPU/memory limits, writes the code files into a private temp
+# directory and runs them (pytest for test files, runpy otherwise). The
+# parent enforces the wall-clock timeout and answers with one JSON line per
+# job.
+SANDBOX_WORKER_SOURCE = r"""
+import contextlib, csv, ctypes, io, json, os, resource, runpy, signal, subprocess, sys, time
+import pytest
 
-# Human oversight agent
+CLONE_NEWNS, CLONE_NEWUSER, CLONE_NEWNET = 0x00020000, 0x10000000, 0x40000000
+MS_BIND, MS_REC, MS_PRIVATE, MNT_DETACH = 0x1000, 0x4000, 0x40000, 2
+NOBODY = 65534
+libc = ctypes.CDLL(None, use_errno=True)
+
+def check(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, "%s: %s" % (what, os.strerror(errno)))
+
+def mount(source, target, fstype, flags, data=None):
+    check(libc.mount(source.encode(), target.encode(),
+                     fstype.encode() if fstype else None, flags,
+                     data.encode() if data else None), "mount " + target)
+
+def isolate(job):
+    uid, gid = os.getuid(), os.getgid()
+    flags = CLONE_NEWNS | CLONE_NEWNET | (CLONE_NEWUSER if uid else 0)
+    check(libc.unshare(flags), "unshare")
+    if uid:
+        for name, value in (("setgroups", "deny"), ("uid_map", "0 %d 1" % uid),
+                            ("gid_map", "0 %d 1" % gid)):
+            with open("/proc/self/" + name, "w") as f:
+                f.write(value)
+    mount("none", "/", None, MS_REC | MS_PRIVATE)
+    keep = sorted({os.path.realpath(p) for p in (sys.prefix, sys.base_prefix)})
+    for path in job["hide"]:
+        # Hide the directory but bind the Python installation back inside it
+        inner = [k for k in keep if k.startswith(path.rstrip("/") + "/")]
+        staged = []
+        for k in inner:
+            stage = os.path.join(job["workdir"], ".keep%d" % len(staged))
+            os.mkdir(stage)
+            mount(k, stage, None, MS_BIND | MS_REC)
+            staged.append((k, stage))
+        mount("tmpfs", path, "tmpfs", 0, "mode=755,size=1m")
+        for k, stage in staged:
+            os.makedirs(k, exist_ok=True)
+            mount(stage, k, None, MS_BIND | MS_REC)
+            check(libc.umount2(stage.encode(), MNT_DETACH), "umount " + stage)
+            os.rmdir(stage)
+    if uid == 0:
+        os.chown(job["workdir"], NOBODY, NOBODY)
+        os.setgroups([])
+        os.setgid(NOBODY)
+        os.setuid(NOBODY)
+
+def run_job(job):
+    os.chdir(job["workdir"])
+    out = os.open("output.txt", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    os.dup2(out, 1)
+    os.dup2(out, 2)
+    sys.stdout = io.TextIOWrapper(os.fdopen(1, "wb", 0), write_through=True)
+    sys.stderr = sys.stdout
+    try:
+        isolate(job)
+    except OSError as exc:
+        if not job["allow_unisolated"]:
+            print("Sandbox isolation unavailable (%s); refusing to run the code. "
+                  "Set AUTOGEN_SANDBOX_ALLOW_UNISOLATED=True to run it anyway." % exc)
+            sys.stdout.flush()
+            os._exit(1)
+    sys.path.insert(0, job["workdir"])
+    limit = job["memory_mb"] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_CPU, (job["timeout"], job["timeout"] + 1))
+    for name, code, _ in job["files"]:
+        with open(name, "w") as f:
+            f.write(code)
+    code = 0
+    for name, _, language in job["files"]:
+        if language in ("sh", "bash", "shell"):
+            if not job["allow_shell"]:
+                print("Shell code blocks are disabled in the sandbox")
+                code = 1
+            else:
+                code = subprocess.call(["bash", name])
+        elif os.path.basename(name).startswith("test_"):
+            code = int(pytest.main(["-q", "-p", "no:cacheprovider", name]))
+        else:
+            try:
+                runpy.run_path(name, run_name="__main__")
+            except SystemExit as exc:
+                code = exc.code if isinstance(exc.code, int) else 1
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+        if code:
+            break
+    sys.stdout.flush()
+    os._exit(code)
+
+for line in sys.stdin:
+    job = json.loads(line)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_job(job)
+        finally:
+            os._exit(1)
+    deadline = time.monotonic() + job["timeout"]
+    status = None
+    while status is None:
+        done, raw = os.waitpid(pid, os.WNOHANG)
+        if done:
+            status = os.waitstatus_to_exitcode(raw)
+        elif time.monotonic() > deadline:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            status = 124
+        else:
+            time.sleep(0.005)
+    try:
+        with open(os.path.join(job["workdir"], "output.txt")) as f:
+            output = f.read()
+    except OSError:
+        output = ""
+    if status == 124:
+        output += "\nTimeout: execution exceeded %s seconds" % job["timeout"]
+    sys.stdout.write(json.dumps({"exit_code": status, "output": output}) + "\n")
+    sys.stdout.flush()
+"""
+
+
+def sandbox_hidden_paths():
+    """Directories masked inside sandbox children: homes and the project dir.
+    
+    Paths containing the temp directory (where jobs run) are left visible,
+    and nested paths are covered by their hidden parent.
+    """
+    tmp = os.path.realpath(tempfile.gettempdir())
+    candidates = {os.path.realpath(p) for p in
+                  (os.path.expanduser("~"), os.getcwd(), "/root", "/home")
+                  if os.path.isdir(p)}
+    candidates = {p for p in candidates
+                  if p != "/" and not (tmp + "/").startswith(p.rstrip("/") + "/")}
+    return sorted(p for p in candidates
+                  if not any(p.startswith(q.rstrip("/") + "/") for q in candidates))
+
+
+# Environment for sandbox workers: nothing inherited, so no API keys leak
+SANDBOX_ENV = {
+    "PATH": os.defpath,
+    "LANG": "C.UTF-8",
+    "HOME": tempfile.gettempdir(),
+    "PYTHONDONTWRITEBYTECODE": "1",
+    "PYTHONNOUSERSITE": "1",
+}
+
+
+class WarmSandboxPool:
+    """Pool of pre-started sandbox worker processes.
+    
+    Jobs are dispatched to idle workers from a thread pool, so ``submit``
+    returns a ``concurrent.futures.Future`` and ``run_many`` gathers several
+    candidates asynchronously. A worker that dies is replaced transparently.
+    """
+    
+    def __init__(self, size=SANDBOX_WORKERS, timeout=SANDBOX_TIMEOUT,
+                 memory_mb=SANDBOX_MEMORY_MB, allow_shell=SANDBOX_ALLOW_SHELL):
+        self.size = size
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.allow_shell = allow_shell
+        self.hidden_paths = sandbox_hidden_paths()
+        self._idle = queue.Queue()
+        self._dispatcher = ThreadPoolExecutor(max_workers=size)
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+    
+    @staticmethod
+    def _start_worker():
+        return subprocess.Popen(
+            [sys.executable, "-c", SANDBOX_WORKER_SOURCE],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            env=SANDBOX_ENV, cwd=tempfile.gettempdir()
+        )
+    
+    def _run(self, files):
+        worker = self._idle.get()
+        try:
+            with tempfile.TemporaryDirectory(prefix="sandbox_") as workdir:
+                job = {"workdir": workdir, "files": files, "timeout": self.timeout,
+                       "memory_mb": self.memory_mb, "hide": self.hidden_paths,
+                       "allow_shell": self.allow_shell,
+                       "allow_unisolated": SANDBOX_ALLOW_UNISOLATED}
+                worker.stdin.write(json.dumps(job) + "\n")
+                worker.stdin.flush()
+                reply = worker.stdout.readline()
+            if not reply:
+                raise RuntimeError("sandbox worker exited unexpectedly")
+            result = json.loads(reply)
+        except (OSError, RuntimeError, ValueError) as exc:
+            worker.kill()
+            worker = self._start_worker()
+            result = {"exit_code": 1, "output": f"Sandbox error: {exc}"}
+        finally:
+            self._idle.put(worker)
+        return CodeResult(exit_code=result["exit_code"], output=result["output"])
+    
+    def submit(self, files):
+        """Run a list of (filename, code, language) files in one sandbox"""
+        return self._dispatcher.submit(self._run, files)
+    
+    async def run_many(self, candidates):
+        """Run several candidates in parallel and collect their CodeResults"""
+        return await asyncio.gather(
+            *(asyncio.wrap_future(self.submit(files)) for files in candidates)
+        )
+    
+    def close(self):
+        self._dispatcher.shutdown(wait=True)
+        while not self._idle.empty():
+            worker = self._idle.get()
+            worker.stdin.close()
+            worker.wait()
+
+
+class WarmPoolCodeExecutor:
+    """AutoGen code executor backed by a WarmSandboxPool.
+    
+    Follows AutoGen's conventions: a ``# filename: <name>`` first line picks
+    the file name, and all blocks of a message are written before any of them
+    runs so tests can import the implementation. Blocks defining ``test_``
+    functions are saved as ``test_*.py`` and run with pytest. Shell blocks
+    are refused unless AUTOGEN_SANDBOX_ALLOW_SHELL is set.
+    """
+    
+    def __init__(self, pool):
+        self.pool = pool
+    
+    @property
+    def code_extractor(self):
+        return MarkdownCodeExtractor()
+    
+    @staticmethod
+    def to_files(code_blocks):
+        files = []
+        for i, block in enumerate(code_blocks):
+            language = (block.language or "python").lower()
+            match = re.match(r"#\s*filename:\s*(\S+)", block.code.strip())
+            if match:
+                name = os.path.basename(match.group(1))
+            elif language in SHELL_LANGUAGES:
+                name = f"script_{i}.sh"
+            elif re.search(r"^def test_", block.code, re.M):
+                name = f"test_candidate_{i}.py"
+            else:
+                name = f"candidate_{i}.py"
+            files.append((name, block.code, language))
+        return files
+    
+    def execute_code_blocks(self, code_blocks):
+        if not self.pool.allow_shell and any(
+            (block.language or "").lower() in SHELL_LANGUAGES for block in code_blocks
+        ):
+            return CodeResult(
+                exit_code=1,
+                output="Shell code blocks are disabled; set "
+                       "AUTOGEN_SANDBOX_ALLOW_SHELL=True to run them."
+            )
+        return self.pool.submit(self.to_files(code_blocks)).result()
+    
+    async def execute_candidates(self, candidates):
+        """Verify several alternative implementations at once"""
+        return await self.pool.run_many([self.to_files(c) for c in candidates])
+    
+    def restart(self):
+        pool = self.pool
+        self.pool = WarmSandboxPool(
+            pool.size, pool.timeout, pool.memory_mb, pool.allow_shell
+        )
+        pool.close()
+
+
+def create_pair():
+    """Create a coder/reviewer pair with routed LLM calls and compaction"""
+    # The code writer agent
+    coder = AssistantAgent(
+        name="SeniorCoder",
+        system_message="""You are a senior software engineer who writes 
+        clean, well-documented Python code. You follow best practices,
+        include comprehensive docstrings, and handle edge cases.""",
+        llm_config={"config_list": config_list}
+    )
+    
+    # The code reviewer agent
+    reviewer = AssistantAgent(
+        name="CodeReviewer",
+        system_message="""You are a meticulous code reviewer who catches
+        bugs, performance issues, security vulnerabilities, and style 
+        violations. You suggest specific improvements with code examples.""",
+        llm_config={"config_list": config_list}
+    )
+    
+    for agent in (coder, reviewer):
+        agent.register_model_client(model_client_cls=RoutedModelClient)
+        # Compact the history each agent sends to the model; the compactor
+        # lives on the agent, so its counters are per session
+        agent.history_compactor = HistoryCompactor() if COMPACT_HISTORY else None
+        if agent.history_compactor:
+            TransformMessages(transforms=[agent.history_compactor]).add_to_agent(agent)
+    return coder, reviewer
+
+
+default_pair = create_pair()
+coder, reviewer = default_pair
+
+# Human oversight agent; runs generated code in the warm sandbox pool
+sandbox_executor = WarmPoolCodeExecutor(WarmSandboxPool())
 human = UserProxyAgent(
     name="HumanReviewer",
     human_input_mode="TERMINATE",
-    max_consecutive_auto_reply=10
+    max_consecutive_auto_reply=10,
+    code_execution_config={"executor": sandbox_executor}
 )
 
+
+def report_tokens_saved(pair=None, label="session"):
+    """Print prompt tokens saved by history compaction for one agent pair"""
+    for agent in pair or default_pair:
+        compactor = getattr(agent, "history_compactor", None)
+        if compactor is None:
+            continue
+        print(f"[{label}] {agent.name}: {compactor.tokens_after} prompt tokens sent "
+              f"instead of {compactor.tokens_before} ({compactor.tokens_saved} saved)")
+
+
+def report_routing():
+    """Print per-endpoint routing statistics"""
+    for stats in router.report():
+        latency = f"{stats['ewma_latency']:.2f}s" if stats["ewma_latency"] else "n/a"
+        print(f"{stats['endpoint']}: {stats['calls']} calls, EWMA latency {latency}, "
+              f"error rate {stats['error_rate']:.0%}")
+    print(f"Hedged requests: {router.hedges}, failovers: {router.failovers}")
+
+
 # Collaborative coding session
-def write_feature_request(feature_description):
+def write_feature_request(feature_description, pair=None):
     """Orchestrate a collaborative coding session"""
+    coder, reviewer = pair or default_pair
     
     # Coder writes the initial implementation
     coder.initiate_chat(
@@ -69,6 +762,23 @@ def write_feature_request(feature_description):
     # Additional rounds of review until approved
     # In production, this would loop until human approval
 
+
+def write_feature_requests(feature_descriptions, max_parallel=BATCH_PARALLEL):
+    """Run many feature sessions at once, each with its own agent pair"""
+    def run(index, description):
+        pair = create_pair()
+        write_feature_request(description, pair)
+        report_tokens_saved(pair, label=f"session {index}")
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        futures = [
+            executor.submit(run, index, description)
+            for index, description in enumerate(feature_descriptions, 1)
+        ]
+        for future in futures:
+            future.result()
+
+
 # Example: Build a data processing pipeline
 write_feature_request(
     """Create a Python class that:
@@ -79,10 +789,24 @@ write_feature_request(
 )
 
 print("Code review complete. Final implementation ready for deployment.")
+report_tokens_saved()
+report_routing()
+sandbox_executor.pool.close()
 
 if __name__ == "__main__":
     # How to run this code:
-    # 1. pip install pyautogen
+    # 1. pip install pyautogen pytest
     # 2. Set OPENAI_API_KEY environment variable
-    # 3. Run: python 04_autogen_pair_programming.py
+    # 3. Optionally tune AUTOGEN_HISTORY_MAX_TOKENS, or set
+    #    AUTOGEN_COMPACT_HISTORY=False to send the full history every turn
+    # 4. Size the code sandbox with AUTOGEN_SANDBOX_WORKERS,
+    #    AUTOGEN_SANDBOX_TIMEOUT (seconds) and AUTOGEN_SANDBOX_MEMORY_MB.
+    #    Shell blocks need AUTOGEN_SANDBOX_ALLOW_SHELL=True; on systems
+    #    without namespace support, jobs are refused unless
+    #    AUTOGEN_SANDBOX_ALLOW_UNISOLATED=True
+    # 5. To spread calls over several endpoints, set AUTOGEN_ENDPOINTS, e.g.
+    #    '[{"model": "gpt-4", "base_url": "http://localhost:8001/v1", "api_key": "x"},
+    #      {"model": "gpt-4", "base_url": "http://localhost:8002/v1", "api_key": "x"}]'
+    #    and use write_feature_requests([...]) to run sessions in batch
+    # 6. Run: python 04_autogen_pair_programming.py
     pass
@@ -4,61 +4,1191 @@ LlamaIndex - RAG-Based Employee Handbook Q&A
 Retrieval-Augmented Generation system for knowledge bases and documentation.
 Creates an interactive Q&A system with source citations.
 
+Indexing is incremental: a manifest maps each handbook file to its content
+hash and chunk IDs, so only new or changed files are embedded, chunks of
+removed files are deleted, and an unchanged corpus starts almost instantly.
+Files to (re)index are parsed in a process pool and streamed through a
+bounded queue into token-sized embedding batches that are sent concurrently.
+Answers are cached by query embedding, so reworded repeats of a question skip
+retrieval and synthesis until one of the answer's source files changes.
+
+Set HR_VECTOR_STORE=mmap to use the built-in MmapVectorStore instead of
+Chroma: quantized vectors in a memory-mapped file with a NumPy IVF index,
+which opens in milliseconds. `python 05_llamaindex_hr_assistant.py
+benchmark-vector-store` compares both stores on a synthetic corpus.
+
+``HRAssistantServer`` serves many employees at once over asyncio: all
+sessions share the index and query engine, each keeps its own bounded chat
+memory (idle sessions are evicted), and concurrent LLM turns are capped.
+`python 05_llamaindex_hr_assistant.py serve-load-test` load-tests the real
+agent, query engine, answer cache and mmap store over a synthetic handbook,
+with mock OpenAI models in place of API calls, and reports p50/p95/p99
+latency.
+
 Requirements:
 - llama-index
 - chromadb
+- tiktoken
+- numpy
 - OpenAI API key
 
 Author: AI Agents Article Examples
 """
 
 import os
-from llama_index import VectorStoreIndex, SimpleDirectoryReader
+import sys
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+import queue
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import (
+    ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+)
+import numpy as np
+import tiktoken
+from llama_index import VectorStoreIndex, SimpleDirectoryReader, ServiceContext
+from llama_index.node_parser import SentenceSplitter
 from llama_index.tools import QueryEngineTool
 from llama_index.agent import OpenAIAgent
+from llama_index.embeddings.base import BaseEmbedding
+from llama_index.llms import OpenAI, ChatMessage, ChatResponse, MessageRole
+from llama_index.memory import ChatMemoryBuffer
 from llama_index.query_engine import RetrieverQueryEngine
-from llama_index.storage.storage_context import StorageContext
+from llama_index.prompts import PromptTemplate
+from llama_index.response_synthesizers import (
+    BaseSynthesizer, ResponseMode, get_response_synthesizer
+)
 from llama_index.vector_stores import ChromaVectorStore
+from llama_index.vector_stores.types import VectorStoreQueryResult
+from llama_index.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
 import chromadb
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall, Function
+)
 
-# Load employee handbook documents
-documents = SimpleDirectoryReader("./handbook_docs").load_data()
+HANDBOOK_DOCS_DIR = os.environ.get("HANDBOOK_DOCS_DIR", "./handbook_docs")
+CHROMA_DB_PATH = os.environ.get("CHROMA_DB_PATH", "./vector_db")
+VECTOR_STORE = os.environ.get("HR_VECTOR_STORE", "chroma")
+MMAP_STORE_PATH = os.environ.get("HR_MMAP_STORE_PATH", "./vector_db/mmap_store")
+MMAP_STORE_DTYPE = os.environ.get("HR_MMAP_STORE_DTYPE", "float16")
+MANIFEST_PATH = os.path.join(
+    MMAP_STORE_PATH if VECTOR_STORE == "mmap" else CHROMA_DB_PATH,
+    "handbook_manifest.json"
+)
 
-# Create vector store for semantic search
-chroma_client = chromadb.PersistentClient(path="./vector_db")
-chroma_collection = chroma_client.create_collection(name="employee_handbook")
-vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+# Ingestion pipeline settings
+PARSE_WORKERS = int(os.environ.get("HR_PARSE_WORKERS", str(os.cpu_count() or 2)))
+EMBED_CONCURRENCY = int(os.environ.get("HR_EMBED_CONCURRENCY", "4"))
+EMBED_BATCH_TOKENS = int(os.environ.get("HR_EMBED_BATCH_TOKENS", "50000"))
+EMBED_BATCH_MAX_INPUTS = 2048
+NODE_QUEUE_SIZE = int(os.environ.get("HR_NODE_QUEUE_SIZE", "4096"))
+MAX_RETRIES = int(os.environ.get("MAX_RETRIES", "3"))
+RETRY_DELAY = float(os.environ.get("RETRY_DELAY", "1"))
+
+# Semantic answer cache settings
+CACHE_SIMILARITY = float(os.environ.get("HR_CACHE_SIMILARITY", "0.92"))
+CACHE_TTL = float(os.environ.get("HR_CACHE_TTL", "86400"))
+CACHE_MAX_ENTRIES = int(os.environ.get("HR_CACHE_MAX_ENTRIES", "1000"))
+
+# Seconds between handbook re-syncs while serving (0 = only at startup)
+RESYNC_INTERVAL = float(os.environ.get("HR_RESYNC_INTERVAL", "300"))
+
+# Multi-session serving settings
+MAX_SESSIONS = int(os.environ.get("HR_MAX_SESSIONS", "1000"))
+SESSION_IDLE_TTL = float(os.environ.get("HR_SESSION_IDLE_TTL", "1800"))
+SESSION_MEMORY_TOKENS = int(os.environ.get("HR_SESSION_MEMORY_TOKENS", "3000"))
+MAX_CONCURRENT_LLM = int(os.environ.get("HR_MAX_CONCURRENT_LLM", "16"))
+
+# Response synthesis: prompt budget for a single compact call (0 = derive
+# from the LLM's context window minus its output reserve)
+SYNTH_CONTEXT_TOKENS = int(os.environ.get("HR_SYNTH_CONTEXT_TOKENS", "0"))
+
+
+def file_sha256(path: str) -> str:
+    """Hash a file's contents in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: dict):
+    """Write the manifest atomically so a crash never leaves it half-written"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def parse_file(path: str) -> list:
+    """Parse one handbook file into Documents (runs in a worker process)"""
+    return SimpleDirectoryReader(input_files=[path]).load_data()
+
+
+class IngestionMetrics:
+    """Thread-safe counters with periodic progress and throughput output"""
+    
+    def __init__(self, total_files: int, interval: float = 5.0):
+        self.total_files = total_files
+        self.interval = interval
+        self.files = self.chunks = self.tokens = self.batches = self.retries = 0
+        self.start = self._last_report = time.perf_counter()
+        self._lock = threading.Lock()
+    
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+            now = time.perf_counter()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                print(self.summary())
+    
+    def summary(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"Indexing: {self.files}/{self.total_files} files parsed, "
+                f"{self.chunks} chunks embedded in {self.batches} batches, "
+                f"{self.tokens / elapsed:,.0f} tokens/s, {self.chunks / elapsed:,.1f} "
+                f"chunks/s, {self.retries} retries, {elapsed:.1f}s elapsed")
+
+
+def embed_with_retry(embed_model, texts: list, metrics: IngestionMetrics,
+                     retries: int = MAX_RETRIES) -> list:
+    """Embed a batch, retrying with exponential backoff on failure"""
+    for attempt in range(retries + 1):
+        try:
+            return embed_model.get_text_embedding_batch(texts)
+        except Exception:
+            if attempt == retries:
+                raise
+            metrics.add(retries=1)
+            time.sleep(RETRY_DELAY * (2 ** attempt))
 
-storage_context = StorageContext.from_defaults(vector_store=vector_store)
-index = VectorStoreIndex.from_documents(
-    documents, 
-    storage_context=storage_context,
-    show_progress=True
-)
 
-# Create query engine with source citation
-query_engine = index.as_query_engine(
-    similarity_top_k=3,
-    response_mode="tree_summarize",
-    text_qa_template="""
+def ingest_files(index, paths: list, on_insert=None) -> dict:
+    """Parse, chunk, embed and insert ``paths``; return their chunk IDs.
+    
+    Stages:
+        1. A process pool parses files in parallel.
+        2. A producer thread splits parsed documents into nodes and puts them
+           on a bounded queue, which applies back-pressure to parsing.
+        3. The main thread groups nodes into batches of up to
+           ``EMBED_BATCH_TOKENS`` tokens and keeps up to ``EMBED_CONCURRENCY``
+           embedding calls in flight; finished batches are inserted with
+           their embeddings already set, so the index does not re-embed them.
+    
+    ``on_insert``, if given, is called with ``{path: [chunk ids]}`` after
+    each batch is inserted, so callers can record progress as it happens.
+    If embedding or insertion fails, the producer is stopped and the parse
+    pool shut down before the error propagates, so nothing is left running.
+    """
+    splitter = SentenceSplitter()
+    encoding = tiktoken.get_encoding("cl100k_base")
+    embed_model = index.service_context.embed_model
+    # get_text_embedding_batch splits by embed_batch_size (100 by default);
+    # raise it so each token-sized batch below goes out as a single request
+    embed_model.embed_batch_size = EMBED_BATCH_MAX_INPUTS
+    metrics = IngestionMetrics(len(paths))
+    nodes_queue = queue.Queue(maxsize=NODE_QUEUE_SIZE)
+    chunk_ids = {path: [] for path in paths}
+    done = object()
+    stop = threading.Event()
+    
+    # fork keeps workers from re-running this script; other platforms parse inline
+    use_processes = (
+        "fork" in multiprocessing.get_all_start_methods() and PARSE_WORKERS > 1
+    )
+    
+    def put(item):
+        """Wait for room on the queue; False once ingestion has been stopped"""
+        while not stop.is_set():
+            try:
+                nodes_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            if use_processes:
+                context = multiprocessing.get_context("fork")
+                with ProcessPoolExecutor(PARSE_WORKERS, mp_context=context) as pool:
+                    futures = [pool.submit(parse_file, p) for p in paths]
+                    try:
+                        for future in as_completed(futures):
+                            if not enqueue(future.result()):
+                                break
+                    finally:
+                        for future in futures:
+                            future.cancel()
+            else:
+                for path in paths:
+                    if not enqueue(parse_file(path)):
+                        break
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            put(done)
+    
+    def enqueue(documents):
+        for node in splitter.get_nodes_from_documents(documents):
+            if not put(node):
+                return False
+        metrics.add(files=1)
+        return True
+    
+    def embed(batch, tokens):
+        texts = [n.get_content(metadata_mode="embed") for n in batch]
+        embeddings = embed_with_retry(embed_model, texts, metrics)
+        for node, embedding in zip(batch, embeddings):
+            node.embedding = embedding
+        return batch, tokens
+    
+    def finish(futures):
+        for future in futures:
+            batch, tokens = future.result()
+            index.insert_nodes(batch)
+            inserted = {}
+            for node in batch:
+                path = os.path.normpath(node.metadata.get("file_path", ""))
+                inserted.setdefault(path, []).append(node.node_id)
+            for path, ids in inserted.items():
+                chunk_ids.setdefault(path, []).extend(ids)
+            if on_insert:
+                on_insert(inserted)
+            metrics.add(chunks=len(batch), batches=1, tokens=tokens)
+    
+    errors = []
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    in_flight = set()
+    batch, batch_tokens = [], 0
+    try:
+        with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY) as embed_pool:
+            try:
+                while True:
+                    node = nodes_queue.get()
+                    if node is done:
+                        if batch:
+                            in_flight.add(embed_pool.submit(embed, batch, batch_tokens))
+                        finish(as_completed(in_flight))
+                        break
+                    text = node.get_content(metadata_mode="embed")
+                    tokens = len(encoding.encode(text))
+                    if batch and (batch_tokens + tokens > EMBED_BATCH_TOKENS
+                                  or len(batch) >= EMBED_BATCH_MAX_INPUTS):
+                        if len(in_flight) >= EMBED_CONCURRENCY:
+                            finished, in_flight = wait(
+                                in_flight, return_when=FIRST_COMPLETED
+                            )
+                            finish(finished)
+                        in_flight.add(embed_pool.submit(embed, batch, batch_tokens))
+                        batch, batch_tokens = [], 0
+                    batch.append(node)
+                    batch_tokens += tokens
+            finally:
+                for future in in_flight:
+                    future.cancel()
+    finally:
+        # After a failure this unblocks the producer, which then cancels
+        # pending parses and shuts the process pool down
+        stop.set()
+        producer.join()
+    if errors:
+        raise errors[0]
+    print(metrics.summary())
+    return chunk_ids
+
+
+def sync_index(index, collection, docs_dir: str, manifest_path: str) -> dict:
+    """Bring the vector store in line with the files in ``docs_dir``.
+    
+    Files whose content hash matches the manifest are skipped. Changed and
+    removed files have their previous chunks deleted from the collection;
+    new and changed files are parsed, embedded and inserted, and their chunk
+    IDs recorded. The manifest is saved after every inserted batch, with
+    files still being ingested marked by a null hash, so a run that crashes
+    part-way leaves a manifest the next run uses to delete the partial
+    chunks before re-ingesting those files.
+    
+    Args:
+        index: VectorStoreIndex backed by ``collection``
+        collection: Chroma collection (or MmapVectorStore) holding the chunks
+        docs_dir: Directory of handbook documents
+        manifest_path: JSON file mapping path -> {"hash", "chunk_ids"}
+        
+    Returns:
+        Counts of added, updated, removed and unchanged files
+    """
+    manifest = load_manifest(manifest_path)
+    current = {}
+    for root, _, files in os.walk(docs_dir):
+        for name in files:
+            if not name.startswith("."):
+                path = os.path.normpath(os.path.join(root, name))
+                current[path] = file_sha256(path)
+    
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    to_embed = []
+    for path in sorted(set(manifest) | set(current)):
+        old, new_hash = manifest.get(path), current.get(path)
+        if old and old["hash"] == new_hash:
+            stats["unchanged"] += 1
+            continue
+        if old:
+            if old["chunk_ids"]:
+                collection.delete(ids=old["chunk_ids"])
+            del manifest[path]
+            stats["updated" if new_hash else "removed"] += 1
+        else:
+            stats["added"] += 1
+        if new_hash:
+            to_embed.append(path)
+    
+    if to_embed:
+        for path in to_embed:
+            manifest[path] = {"hash": None, "chunk_ids": []}
+        
+        def record(inserted):
+            for path, ids in inserted.items():
+                entry = manifest.setdefault(path, {"hash": None, "chunk_ids": []})
+                entry["chunk_ids"].extend(ids)
+            save_manifest(manifest_path, manifest)
+        
+        ingest_files(index, to_embed, on_insert=record)
+        for path in to_embed:
+            manifest[path]["hash"] = current[path]
+    
+    if to_embed or stats["removed"] or stats["updated"]:
+        save_manifest(manifest_path, manifest)
+    return stats
+
+
+class MmapVectorStore:
+    """Embedded vector store backed by a memory-mapped file and NumPy.
+    
+    Layout of the store directory:
+        vectors.bin      unit-normalized vectors, float16 or int8 rows
+        scales.bin       per-row float32 scale (int8 only)
+        nodes.sqlite     row -> node id, ref doc id, serialized node, deleted
+        centroids.npy    IVF centroids (spherical k-means)
+        ivf_rows.npy     row ids grouped by list; ivf_offsets.npy list bounds
+    
+    Opening maps the files instead of reading them, so startup cost does not
+    grow with the corpus. Queries probe the ``nprobe`` nearest IVF lists plus
+    any rows added since the last build, scoring candidates with one matrix
+    product; small stores are scanned exactly. Implements the llama-index
+    vector store interface (``add``/``delete``/``query`` and their async
+    variants); metadata filters are not supported.
+    
+    Vectors are appended before their rows are committed to SQLite, so
+    opening the store truncates the binary files to the committed row count
+    and drops whatever a crashed write left behind.
+    """
+    
+    stores_text = True
+    is_embedding_query = True
+    flat_metadata = False
+    
+    def __init__(self, path: str, dtype: str = MMAP_STORE_DTYPE, nprobe: int = 8,
+                 min_ivf_rows: int = 4096):
+        if dtype not in ("float16", "int8"):
+            raise ValueError("dtype must be 'float16' or 'int8'")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.nprobe = nprobe
+        self.min_ivf_rows = min_ivf_rows
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "nodes.sqlite"),
+                                   check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                row INTEGER PRIMARY KEY, node_id TEXT UNIQUE, ref_doc_id TEXT,
+                payload TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS idx_ref_doc ON nodes (ref_doc_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        stored = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        self.dtype = stored.get("dtype", dtype)
+        self.dim = int(stored["dim"]) if "dim" in stored else None
+        self._truncate_uncommitted()
+        self._open_arrays()
+    
+    @property
+    def client(self):
+        return self._db
+    
+    def _file(self, name):
+        return os.path.join(self.path, name)
+    
+    def _truncate_uncommitted(self):
+        rows = self._db.execute(
+            "SELECT COALESCE(MAX(row) + 1, 0) FROM nodes"
+        ).fetchone()[0]
+        vector_bytes = (self.dim or 0) * np.dtype(self.dtype).itemsize
+        for name, row_bytes in (("vectors.bin", vector_bytes),
+                                ("scales.bin", np.dtype(np.float32).itemsize)):
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * row_bytes:
+                os.truncate(path, rows * row_bytes)
+    
+    def _open_arrays(self):
+        self.rows = self._db.execute(
+            "SELECT COALESCE(MAX(row) + 1, 0) FROM nodes"
+        ).fetchone()[0]
+        self._vectors = self._scales = None
+        if self.rows:
+            self._vectors = np.memmap(self._file("vectors.bin"),
+                                      dtype=np.dtype(self.dtype),
+                                      mode="r", shape=(self.rows, self.dim))
+            if self.dtype == "int8":
+                self._scales = np.memmap(self._file("scales.bin"), dtype=np.float32,
+                                         mode="r", shape=(self.rows,))
+        self._deleted = np.zeros(self.rows, dtype=bool)
+        deleted = [
+            r for (r,) in self._db.execute("SELECT row FROM nodes WHERE deleted = 1")
+        ]
+        self._deleted[deleted] = True
+        self._centroids = None
+        self._indexed = 0
+        if os.path.exists(self._file("centroids.npy")):
+            self._centroids = np.load(self._file("centroids.npy"))
+            self._ivf_rows = np.load(self._file("ivf_rows.npy"), mmap_mode="r")
+            self._ivf_offsets = np.load(self._file("ivf_offsets.npy"))
+            self._indexed = int(self._ivf_offsets[-1])
+    
+    def _decode(self, rows):
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows, None]
+        return vectors
+    
+    @staticmethod
+    def _normalize(matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+    
+    def add_vectors(self, embeddings, node_ids, ref_doc_ids, payloads):
+        """Append vectors with their node records; returns the node ids"""
+        matrix = self._normalize(embeddings)
+        with self._lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                     [("dim", str(self.dim)), ("dtype", self.dtype)])
+            if self.dtype == "int8":
+                scales = np.abs(matrix).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                data = np.round(matrix / scales[:, None]).astype(np.int8)
+                with open(self._file("scales.bin"), "ab") as f:
+                    f.write(scales.astype(np.float32).tobytes())
+            else:
+                data = matrix.astype(np.float16)
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(data.tobytes())
+            # Replacing a node marks its old row deleted and appends a new one
+            self._db.executemany(
+                "UPDATE nodes SET deleted = 1, node_id = NULL WHERE node_id = ?",
+                [(i,) for i in node_ids]
+            )
+            self._db.executemany(
+                "INSERT INTO nodes (row, node_id, ref_doc_id, payload) "
+                "VALUES (?, ?, ?, ?)",
+                [(self.rows + i, node_id, ref_doc_id, payload)
+                 for i, (node_id, ref_doc_id, payload)
+                 in enumerate(zip(node_ids, ref_doc_ids, payloads))]
+            )
+            self._db.commit()
+            self._open_arrays()
+            growth = max(1024, self._indexed // 10)
+            if self.rows >= self.min_ivf_rows and self.rows - self._indexed > growth:
+                self.build_ivf()
+        return list(node_ids)
+    
+    def add(self, nodes, **kwargs):
+        payloads = [
+            json.dumps(node_to_metadata_dict(node, remove_text=False,
+                                             flat_metadata=False))
+            for node in nodes
+        ]
+        return self.add_vectors(
+            [node.get_embedding() for node in nodes], [node.node_id for node in nodes],
+            [node.ref_doc_id for node in nodes], payloads
+        )
+    
+    async def async_add(self, nodes, **kwargs):
+        return await asyncio.to_thread(self.add, nodes, **kwargs)
+    
+    def delete(self, ref_doc_id=None, ids=None, **kwargs):
+        """Delete by ref doc id (llama-index interface) or by node ids"""
+        with self._lock:
+            if ref_doc_id is not None:
+                self._db.execute("UPDATE nodes SET deleted = 1 WHERE ref_doc_id = ?",
+                                 (ref_doc_id,))
+            if ids:
+                self._db.executemany("UPDATE nodes SET deleted = 1 WHERE node_id = ?",
+                                     [(i,) for i in ids])
+            self._db.commit()
+            self._open_arrays()
+    
+    async def adelete(self, ref_doc_id=None, ids=None, **kwargs):
+        await asyncio.to_thread(self.delete, ref_doc_id, ids, **kwargs)
+    
+    def build_ivf(self, nlist: int = None, iterations: int = 10, seed: int = 0):
+        """(Re)build the IVF lists over every stored row"""
+        with self._lock:
+            n = self.rows
+            nlist = nlist or max(1, int(4 * np.sqrt(n)))
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(n, size=min(n, 64 * nlist), replace=False))
+            data = self._decode(sample)
+            centroids = data[rng.choice(len(data), size=nlist, replace=False)]
+            for _ in range(iterations):
+                assign = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, data)
+                empty = np.bincount(assign, minlength=nlist) == 0
+                sums[empty] = centroids[empty]
+                centroids = self._normalize(sums)
+            assign = np.empty(n, dtype=np.int32)
+            for start in range(0, n, 65536):
+                block = self._decode(np.arange(start, min(n, start + 65536)))
+                assign[start:start + len(block)] = np.argmax(block @ centroids.T,
+                                                             axis=1)
+            order = np.argsort(assign, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+            offsets = offsets.astype(np.int64)
+            for name, array in (("ivf_rows", order), ("ivf_offsets", offsets),
+                                ("centroids", centroids)):
+                tmp = self._file(name + ".tmp.npy")
+                np.save(tmp, array)
+                os.replace(tmp, self._file(name + ".npy"))
+            self._open_arrays()
+    
+    def search(self, queries, k: int = 3):
+        """Batched top-k search; returns (rows, scores) arrays of shape (q, k)"""
+        queries = self._normalize(np.atleast_2d(queries))
+        rows_out = np.full((len(queries), k), -1, dtype=np.int64)
+        scores_out = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if not self.rows:
+            return rows_out, scores_out
+        
+        if self._centroids is None:
+            candidates = [np.arange(self.rows)] * len(queries)
+        else:
+            probes = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :self.nprobe]
+            tail = np.arange(self._indexed, self.rows)
+            ivf, bounds = self._ivf_rows, self._ivf_offsets
+            candidates = [
+                np.concatenate([ivf[bounds[l]:bounds[l + 1]] for l in probe] + [tail])
+                for probe in probes
+            ]
+        
+        if self._centroids is None:
+            # Exact scan: one matrix product for the whole query batch
+            scores = queries @ self._decode(candidates[0]).T
+            scores[:, self._deleted] = -np.inf
+            all_scores = [scores[i] for i in range(len(queries))]
+        else:
+            all_scores = []
+            for i, query in enumerate(queries):
+                # Sorted, de-duplicated rows keep memory-mapped reads sequential
+                candidates[i] = rows = np.unique(candidates[i])
+                scores = self._decode(rows) @ query
+                scores[self._deleted[rows]] = -np.inf
+                all_scores.append(scores)
+        
+        for i, (rows, scores) in enumerate(zip(candidates, all_scores)):
+            top = min(k, len(rows))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            rows_out[i, :top], scores_out[i, :top] = rows[best], scores[best]
+        return rows_out, scores_out
+    
+    def query(self, query, **kwargs):
+        # Held so a concurrent add/delete can't swap the arrays mid-search
+        with self._lock:
+            rows, scores = self.search(np.asarray(query.query_embedding),
+                                       query.similarity_top_k)
+            keep = [(int(r), float(sc)) for r, sc in zip(rows[0], scores[0])
+                    if r >= 0 and np.isfinite(sc)]
+            records = {}
+            if keep:
+                marks = ",".join("?" * len(keep))
+                cursor = self._db.execute(
+                    f"SELECT row, node_id, payload FROM nodes WHERE row IN ({marks})",
+                    [r for r, _ in keep]
+                )
+                records = {row: (node_id, payload) for row, node_id, payload in cursor}
+        return VectorStoreQueryResult(
+            nodes=[metadata_dict_to_node(json.loads(records[r][1])) for r, _ in keep],
+            similarities=[sc for _, sc in keep],
+            ids=[records[r][0] for r, _ in keep],
+        )
+    
+    async def aquery(self, query, **kwargs):
+        return await asyncio.to_thread(self.query, query, **kwargs)
+
+
+def benchmark_vector_stores(n: int = 20000, dim: int = 1536, queries: int = 200,
+                            k: int = 3):
+    """Compare MmapVectorStore with Chroma on a synthetic clustered corpus.
+    
+    Reports cold open + first query time, per-query latency, batched query
+    throughput for the mmap store, and recall@k against exact search.
+    """
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((64, dim)).astype(np.float32)
+    labels = rng.integers(0, 64, n)
+    corpus = centers[labels] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    picks = rng.choice(n, queries, replace=False)
+    noise = rng.standard_normal((queries, dim)).astype(np.float32)
+    probes = corpus[picks] + 0.1 * noise
+    ids = [f"node-{i}" for i in range(n)]
+    normalized = MmapVectorStore._normalize(corpus)
+    similarity = MmapVectorStore._normalize(probes) @ normalized.T
+    exact = np.argsort(-similarity, axis=1)[:, :k]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        store = MmapVectorStore(os.path.join(tmp, "mmap"))
+        for i in range(0, n, 5000):
+            store.add_vectors(corpus[i:i + 5000], ids[i:i + 5000], ids[i:i + 5000],
+                              ["{}"] * len(ids[i:i + 5000]))
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        store = MmapVectorStore(os.path.join(tmp, "mmap"))
+        store.search(probes[0], k)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        found = np.vstack([store.search(q, k)[0] for q in probes])
+        single = (time.perf_counter() - start) / queries
+        start = time.perf_counter()
+        store.search(probes, k)
+        batched = (time.perf_counter() - start) / queries
+        recall = np.mean([len(set(f) & set(e)) / k for f, e in zip(found, exact)])
+        print(f"mmap   : build {build:.2f}s, open+first query {cold * 1000:.1f}ms, "
+              f"{single * 1000:.2f}ms/query, batched {batched * 1000:.3f}ms/query, "
+              f"recall@{k} {recall:.3f}")
+        
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "chroma"))
+        collection = client.create_collection("bench",
+                                              metadata={"hnsw:space": "cosine"})
+        for i in range(0, n, 5000):
+            collection.add(ids=ids[i:i + 5000], embeddings=corpus[i:i + 5000].tolist())
+        build = time.perf_counter() - start
+        del client, collection
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "chroma"))
+        collection = client.get_collection("bench")
+        collection.query(query_embeddings=[probes[0].tolist()], n_results=k)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [collection.query(query_embeddings=[q.tolist()], n_results=k)["ids"][0]
+                 for q in probes]
+        single = (time.perf_counter() - start) / queries
+        recall = np.mean([len({int(i.split("-")[1]) for i in f} & set(e)) / k
+                          for f, e in zip(found, exact)])
+        print(f"chroma : build {build:.2f}s, open+first query {cold * 1000:.1f}ms, "
+              f"{single * 1000:.2f}ms/query, recall@{k} {recall:.3f}")
+
+
+class SemanticAnswerCache:
+    """LRU/TTL cache of query responses keyed by query embedding.
+    
+    A lookup returns the stored response of the most similar earlier query
+    when the cosine similarity reaches ``threshold``. Each entry records the
+    content hash of every handbook file its answer was built from; if the
+    incremental index has since changed or removed one of them, the entry is
+    dropped instead of served.
+    """
+    
+    def __init__(self, embed_model, manifest_provider, threshold=CACHE_SIMILARITY,
+                 ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.embed_model = embed_model
+        self.manifest_provider = manifest_provider
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "evicted": 0}
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+    
+    def _is_current(self, sources: dict) -> bool:
+        manifest = self.manifest_provider()
+        return all(
+            path in manifest and manifest[path]["hash"] == digest
+            for path, digest in sources.items()
+        )
+    
+    def _drop(self, key, reason):
+        del self._entries[key]
+        self.stats[reason] += 1
+    
+    def lookup(self, embedding: np.ndarray):
+        """Return a cached response for a similar query, or None"""
+        with self._lock:
+            now = time.time()
+            for key in [k for k, e in self._entries.items() if e["expires"] <= now]:
+                self._drop(key, "expired")
+            if self._entries:
+                keys = list(self._entries)
+                matrix = np.stack([self._entries[k]["embedding"] for k in keys])
+                scores = matrix @ embedding
+                for i in np.argsort(-scores):
+                    if scores[i] < self.threshold:
+                        break
+                    entry = self._entries[keys[i]]
+                    if not self._is_current(entry["sources"]):
+                        self._drop(keys[i], "stale")
+                        continue
+                    self._entries.move_to_end(keys[i])
+                    self.stats["hits"] += 1
+                    return entry["response"]
+            self.stats["misses"] += 1
+            return None
+    
+    def store(self, embedding: np.ndarray, response):
+        manifest = self.manifest_provider()
+        sources = {}
+        for source in getattr(response, "source_nodes", None) or []:
+            path = os.path.normpath(source.node.metadata.get("file_path", ""))
+            if path in manifest:
+                sources[path] = manifest[path]["hash"]
+        with self._lock:
+            self._entries[self._next_key] = {
+                "embedding": embedding, "response": response,
+                "sources": sources, "expires": time.time() + self.ttl,
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)), "evicted")
+    
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+    
+    def embed(self, query: str) -> np.ndarray:
+        return self._unit(self.embed_model.get_query_embedding(query))
+    
+    async def aembed(self, query: str) -> np.ndarray:
+        return self._unit(await self.embed_model.aget_query_embedding(query))
+    
+    def report(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, entries=len(self._entries),
+                        hit_rate=self.stats["hits"] / lookups if lookups else 0.0)
+
+
+class CachedQueryEngine:
+    """Query engine wrapper that answers from a SemanticAnswerCache when it can"""
+    
+    def __init__(self, query_engine, cache: SemanticAnswerCache):
+        self.query_engine = query_engine
+        self.cache = cache
+    
+    def query(self, query):
+        query_str = str(query)
+        embedding = self.cache.embed(query_str)
+        response = self.cache.lookup(embedding)
+        if response is None:
+            response = self.query_engine.query(query)
+            self.cache.store(embedding, response)
+        return response
+    
+    async def aquery(self, query):
+        query_str = str(query)
+        embedding = await self.cache.aembed(query_str)
+        response = self.cache.lookup(embedding)
+        if response is None:
+            response = await self.query_engine.aquery(query)
+            self.cache.store(embedding, response)
+        return response
+
+
+class AdaptiveSynthesizer(BaseSynthesizer):
+    """Answer in one compact LLM call when the retrieved context fits.
+    
+    Measures the prompt the compact path would send (template + question +
+    retrieved chunks) and falls back to tree summarization only when it is
+    over budget. Both paths use the same QA template, so answers cite their
+    sources the same way whichever path ran.
+    """
+    
+    def __init__(self, qa_template, service_context=None,
+                 context_tokens=SYNTH_CONTEXT_TOKENS):
+        super().__init__(service_context=service_context)
+        self._qa_template = qa_template
+        if not context_tokens:
+            metadata = self._service_context.llm.metadata
+            context_tokens = metadata.context_window - metadata.num_output
+        self.context_tokens = context_tokens
+        self._encoding = tiktoken.get_encoding("cl100k_base")
+        self._compact = get_response_synthesizer(
+            service_context=self._service_context,
+            response_mode=ResponseMode.COMPACT,
+            text_qa_template=qa_template
+        )
+        self._tree = get_response_synthesizer(
+            service_context=self._service_context,
+            response_mode=ResponseMode.TREE_SUMMARIZE,
+            summary_template=qa_template
+        )
+        self.paths = {"compact": 0, "tree_summarize": 0}
+    
+    def _get_prompts(self):
+        return {"text_qa_template": self._qa_template}
+    
+    def _update_prompts(self, prompts):
+        if "text_qa_template" in prompts:
+            self._qa_template = prompts["text_qa_template"]
+            self._compact.update_prompts({"text_qa_template": self._qa_template})
+            self._tree.update_prompts({"summary_template": self._qa_template})
+    
+    def _choose(self, query_str, text_chunks):
+        """Pick the synthesizer for this prompt size and log the choice"""
+        prompt = self._qa_template.format(
+            context_str="\n\n".join(text_chunks), query_str=query_str
+        )
+        tokens = len(self._encoding.encode(prompt, disallowed_special=()))
+        path = "compact" if tokens <= self.context_tokens else "tree_summarize"
+        self.paths[path] += 1
+        print(f"[synthesis] {path}: {tokens} prompt tokens "
+              f"(budget {self.context_tokens}, {len(text_chunks)} chunks)")
+        return self._compact if path == "compact" else self._tree
+    
+    def get_response(self, query_str, text_chunks, **response_kwargs):
+        synthesizer = self._choose(query_str, text_chunks)
+        return synthesizer.get_response(query_str, text_chunks, **response_kwargs)
+    
+    async def aget_response(self, query_str, text_chunks, **response_kwargs):
+        synthesizer = self._choose(query_str, text_chunks)
+        return await synthesizer.aget_response(query_str, text_chunks,
+                                               **response_kwargs)
+
+
+class SessionStore:
+    """Bounded map of session id -> agent with per-session chat memory.
+    
+    Sessions idle for longer than ``idle_ttl`` are evicted on access, and
+    the least recently used session is evicted when ``max_sessions`` is
+    reached, so memory stays bounded however many employees connect.
+    Sessions with a turn in progress are never evicted; if every session is
+    busy the store grows past ``max_sessions`` until one finishes.
+    """
+    
+    def __init__(self, agent_factory, max_sessions=MAX_SESSIONS,
+                 idle_ttl=SESSION_IDLE_TTL):
+        self.agent_factory = agent_factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.evicted = 0
+        self._sessions = OrderedDict()
+    
+    def get(self, session_id):
+        """Return (agent, lock) for ``session_id``, creating it if needed"""
+        now = time.monotonic()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest["last_used"] < self.idle_ttl or oldest["lock"].locked():
+                break
+            del self._sessions[oldest_id]
+            self.evicted += 1
+        session = self._sessions.get(session_id)
+        if session is None:
+            excess = len(self._sessions) - self.max_sessions + 1
+            if excess > 0:
+                idle = [sid for sid, s in self._sessions.items()
+                        if not s["lock"].locked()]
+                for sid in idle[:excess]:
+                    del self._sessions[sid]
+                    self.evicted += 1
+            session = {"agent": self.agent_factory(), "lock": asyncio.Lock()}
+            self._sessions[session_id] = session
+        session["last_used"] = now
+        self._sessions.move_to_end(session_id)
+        return session["agent"], session["lock"]
+    
+    def __len__(self):
+        return len(self._sessions)
+
+
+class HRAssistantServer:
+    """Asyncio front end serving many chat sessions over one shared index.
+    
+    Turns within a session are serialized (chat memory is not concurrency
+    safe), while turns of different sessions run concurrently up to
+    ``max_concurrent`` at a time. Each agent turn issues its LLM calls one
+    after another, so this also caps LLM calls in flight. Latency
+    percentiles cover the last ``latency_window`` requests.
+    """
+    
+    def __init__(self, agent_factory, max_concurrent=MAX_CONCURRENT_LLM,
+                 latency_window=10000, **store_kwargs):
+        self.sessions = SessionStore(agent_factory, **store_kwargs)
+        self.max_concurrent = max_concurrent
+        self.requests = 0
+        self.latencies = deque(maxlen=latency_window)
+        self._semaphore = None
+    
+    async def handle(self, session_id, message):
+        """Answer one message in ``session_id``; returns the response text"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        start = time.perf_counter()
+        agent, lock = self.sessions.get(session_id)
+        async with lock:
+            async with self._semaphore:
+                response = await agent.achat(message)
+        self.latencies.append(time.perf_counter() - start)
+        self.requests += 1
+        return str(response)
+    
+    def latency_report(self):
+        """Return request count and p50/p95/p99 latency in seconds"""
+        if not self.latencies:
+            return {"requests": 0}
+        p50, p95, p99 = np.percentile(self.latencies, [50, 95, 99])
+        return {"requests": self.requests, "p50": p50, "p95": p95, "p99": p99}
+
+
+class MockOpenAI(OpenAI):
+    """OpenAI LLM stand-in for load tests: sleeps like an API call, sends none.
+    
+    When tools are offered for a new user message it calls the handbook
+    tool with that message; otherwise (tool results, synthesis prompts) it
+    returns a canned answer.
+    """
+    
+    mean_latency: float = 0.8
+    
+    async def achat(self, messages, **kwargs):
+        await asyncio.sleep(random.expovariate(1 / self.mean_latency))
+        last = messages[-1]
+        if kwargs.get("tools") and last.role == MessageRole.USER:
+            call = ChatCompletionMessageToolCall(
+                id=f"call_{random.getrandbits(64):x}", type="function",
+                function=Function(name="hr_policy_search",
+                                  arguments=json.dumps({"input": last.content}))
+            )
+            return ChatResponse(message=ChatMessage(
+                role=MessageRole.ASSISTANT, content=None,
+                additional_kwargs={"tool_calls": [call]}
+            ))
+        return ChatResponse(message=ChatMessage(
+            role=MessageRole.ASSISTANT,
+            content=f"Mock answer ({len(messages)} messages)"
+        ))
+
+
+class HashEmbedding(BaseEmbedding):
+    """Deterministic bag-of-words embedding for load tests (no API calls)"""
+    
+    dim: int = 256
+    
+    def _vector(self, text: str) -> list:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+    
+    def _get_text_embedding(self, text: str) -> list:
+        return self._vector(text)
+    
+    def _get_query_embedding(self, query: str) -> list:
+        return self._vector(query)
+    
+    async def _aget_query_embedding(self, query: str) -> list:
+        return self._vector(query)
+
+
+LOAD_TEST_TOPICS = [
+    "vacation", "expense reimbursement", "remote work", "promotion review",
+    "parental leave", "sick leave", "health benefits", "training budget",
+    "equipment", "travel", "overtime", "code of conduct",
+]
+LOAD_TEST_QUESTIONS = [
+    "What is the {topic} policy?",
+    "Can you explain the {topic} policy?",
+    "How does {topic} work for new employees?",
+]
+
+
+def write_synthetic_handbook(docs_dir: str, files: int = 48):
+    """Write ``files`` policy documents covering LOAD_TEST_TOPICS"""
+    os.makedirs(docs_dir, exist_ok=True)
+    rng = random.Random(0)
+    for i in range(files):
+        topic = LOAD_TEST_TOPICS[i % len(LOAD_TEST_TOPICS)]
+        sections = [
+            f"Section {i}.{n}: {topic.capitalize()} policy. Employees with "
+            f"{rng.randint(0, 10)} years of service follow rule "
+            f"{rng.randint(1, 99)} for {topic}; requests go to the HR portal "
+            f"at least {rng.randint(1, 30)} days ahead."
+            for n in range(20)
+        ]
+        path = os.path.join(docs_dir, f"policy_{i:03d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(sections))
+
+
+async def run_serve_load_test(server, sessions=200, turns=3):
+    """Simulate ``sessions`` employees, each sending ``turns`` messages"""
+    
+    async def employee(i):
+        for turn in range(turns):
+            await asyncio.sleep(random.uniform(0, 0.5))
+            question = random.choice(LOAD_TEST_QUESTIONS).format(
+                topic=random.choice(LOAD_TEST_TOPICS)
+            )
+            await server.handle(f"employee-{i}", question)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(employee(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    report = server.latency_report()
+    print(f"{report['requests']} requests from {sessions} sessions in {elapsed:.1f}s "
+          f"(max {server.max_concurrent} concurrent LLM turns): "
+          f"p50 {report['p50']:.2f}s, "
+          f"p95 {report['p95']:.2f}s, p99 {report['p99']:.2f}s, "
+          f"{len(server.sessions)} sessions live")
+
+
+if len(sys.argv) > 1 and sys.argv[1] == "benchmark-vector-store":
+    benchmark_vector_stores()
+    sys.exit(0)
+
+# serve-load-test runs the real pipeline below over a synthetic handbook in a
+# temporary directory, with mock models in place of the OpenAI API
+LOAD_TEST = len(sys.argv) > 1 and sys.argv[1] == "serve-load-test"
+service_context = agent_llm = None
+if LOAD_TEST:
+    load_test_dir = tempfile.mkdtemp(prefix="hr-load-test-")
+    HANDBOOK_DOCS_DIR = os.path.join(load_test_dir, "handbook_docs")
+    write_synthetic_handbook(HANDBOOK_DOCS_DIR)
+    VECTOR_STORE = "mmap"
+    MMAP_STORE_PATH = os.path.join(load_test_dir, "mmap_store")
+    MANIFEST_PATH = os.path.join(MMAP_STORE_PATH, "handbook_manifest.json")
+    agent_llm = MockOpenAI(api_key="load-test")
+    service_context = ServiceContext.from_defaults(llm=agent_llm,
+                                                   embed_model=HashEmbedding())
+
+# Open (or create) the persistent vector store for semantic search
+if VECTOR_STORE == "mmap":
+    vector_store = chunk_store = MmapVectorStore(MMAP_STORE_PATH)
+else:
+    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    chunk_store = chroma_client.get_or_create_collection(name="employee_handbook")
+    vector_store = ChromaVectorStore(chroma_collection=chunk_store)
+
+index = VectorStoreIndex.from_vector_store(vector_store,
+                                           service_context=service_context)
+
+
+def resync_handbook() -> dict:
+    """Embed only new or changed handbook documents and refresh the manifest.
+    
+    The answer cache checks entries against ``handbook_manifest``, so
+    reloading it here is what invalidates answers built from changed files.
+    """
+    global handbook_manifest
+    try:
+        stats = sync_index(index, chunk_store, HANDBOOK_DOCS_DIR, MANIFEST_PATH)
+    finally:
+        # A failed sync still saved progress; answers from files it touched
+        # must stop being served either way
+        handbook_manifest = load_manifest(MANIFEST_PATH)
+    print(f"Handbook index: {stats['added']} added, {stats['updated']} "
+          f"updated, {stats['removed']} removed, {stats['unchanged']} unchanged")
+    return stats
+
+
+async def watch_handbook(interval=RESYNC_INTERVAL):
+    """Re-sync the handbook every ``interval`` seconds while serving.
+    
+    A failed re-sync is logged and retried on the next interval; the cache
+    keeps checking against the last manifest that was saved.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(resync_handbook)
+        except Exception as e:
+            print(f"Handbook re-sync failed, retrying in {interval:.0f}s: {e}")
+
+
+resync_handbook()
+
+# Create query engine with source citation; synthesis only builds a
+# summarization tree when the retrieved chunks don't fit in one prompt
+hr_qa_template = PromptTemplate("""
     You are a helpful HR assistant. Use the provided context 
     from the employee handbook to answer questions. Always cite 
     your sources by referencing the document sections.
     
     Context: {context_str}
     Question: {query_str}
-    """
+    """)
+synthesizer = AdaptiveSynthesizer(hr_qa_template, service_context=index.service_context)
+query_engine = RetrieverQueryEngine(
+    retriever=index.as_retriever(similarity_top_k=3),
+    response_synthesizer=synthesizer
 )
 
+# Answer reworded repeats of earlier questions from the semantic cache
+answer_cache = SemanticAnswerCache(
+    index.service_context.embed_model, lambda: handbook_manifest
+)
+cached_query_engine = CachedQueryEngine(query_engine, answer_cache)
+
 # Wrap in a tool for agent use
 hr_tool = QueryEngineTool(
-    query_engine=query_engine,
+    query_engine=cached_query_engine,
     name="hr_policy_search",
     description="Search employee handbook for HR policy information"
 )
 
-# Create conversational agent
-agent = OpenAIAgent.from_tools([hr_tool], verbose=True)
+
+def make_session_agent():
+    """Create a conversational agent with its own bounded chat memory"""
+    return OpenAIAgent.from_tools(
+        [hr_tool],
+        llm=agent_llm,
+        memory=ChatMemoryBuffer.from_defaults(token_limit=SESSION_MEMORY_TOKENS),
+        verbose=not LOAD_TEST
+    )
+
+
+# Serve conversations; every session shares the same index and query engine
+server = HRAssistantServer(make_session_agent)
+
+if LOAD_TEST:
+    asyncio.run(run_serve_load_test(server))
+    cache_report = answer_cache.report()
+    print(f"Answer cache: {cache_report['hits']} hits, {cache_report['misses']} misses "
+          f"({cache_report['hit_rate']:.0%} hit rate)")
+    sys.exit(0)
 
 # Example conversation
 conversations = [
@@ -68,17 +1198,48 @@ conversations = [
     "Can you explain the promotion review process?"
 ]
 
+
+async def run_demo_session():
+    watcher = asyncio.create_task(watch_handbook()) if RESYNC_INTERVAL > 0 else None
+    try:
+        for question in conversations:
+            print(f"Employee: {question}")
+            response = await server.handle("demo-employee", question)
+            print(f"HR Assistant: {response}\n")
+            print("-" * 50)
+    finally:
+        if watcher:
+            watcher.cancel()
+
+
 print("=== HR ASSISTANT SESSION ===\n")
-for question in conversations:
-    print(f"Employee: {question}")
-    response = agent.chat(question)
-    print(f"HR Assistant: {response}\n")
-    print("-" * 50)
+asyncio.run(run_demo_session())
+
+cache_report = answer_cache.report()
+print(f"Answer cache: {cache_report['hits']} hits, {cache_report['misses']} misses "
+      f"({cache_report['hit_rate']:.0%} hit rate), {cache_report['stale']} invalidated "
+      f"by handbook changes, {cache_report['entries']} entries")
+print(f"Synthesis paths: {synthesizer.paths['compact']} compact, "
+      f"{synthesizer.paths['tree_summarize']} tree_summarize")
 
 if __name__ == "__main__":
     # How to run this code:
-    # 1. pip install llama-index chromadb
+    # 1. pip install llama-index chromadb tiktoken numpy
     # 2. Create ./handbook_docs folder with PDF/TXT policy documents
     # 3. Set OPENAI_API_KEY
     # 4. Run: python 05_llamaindex_hr_assistant.py
+    #    (re-runs only embed files that changed since the last run)
+    # 5. Tune the answer cache with HR_CACHE_SIMILARITY (cosine, 0-1),
+    #    HR_CACHE_TTL (seconds) and HR_CACHE_MAX_ENTRIES; the server re-syncs
+    #    the handbook every HR_RESYNC_INTERVAL seconds and drops cached
+    #    answers whose source files changed
+    # 6. Set HR_VECTOR_STORE=mmap (and optionally HR_MMAP_STORE_DTYPE=int8)
+    #    to use the embedded memory-mapped store; compare it with Chroma via
+    #    python 05_llamaindex_hr_assistant.py benchmark-vector-store
+    # 7. Load-test the multi-session server with mock OpenAI models:
+    #    python 05_llamaindex_hr_assistant.py serve-load-test
+    #    (limits: HR_MAX_SESSIONS, HR_SESSION_IDLE_TTL, HR_MAX_CONCURRENT_LLM)
+    # 8. Answers use one compact LLM call when the retrieved context fits in
+    #    HR_SYNTH_CONTEXT_TOKENS (default: the model's window) and fall back
+    #    to tree summarization otherwise; each query logs the path taken
     pass
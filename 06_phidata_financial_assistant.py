@@ -4,10 +4,31 @@ Phidata - Financial Data Analysis Assistant
 Task-specific agents that excel at their particular domain.
 Automated financial analysis with stock data.
 
+Quotes for many tickers are fetched in one pass: prices come from a single
+bulk download, fundamentals from the cache (or a bounded thread pool of
+`info` requests for stale ones), and a failing ticker only blanks its own
+row. `python 06_phidata_financial_assistant.py
+benchmark-quotes` compares this with one-at-a-time fetching against a local
+stub source with injected latency.
+
+``screen_stocks`` buckets, ranks and scores a whole quote table with
+vectorized pandas/NumPy operations and keeps only the top-N rows, so the LLM
+sees a short table instead of per-ticker prose.
+
+Daily price history lives in a local store of memory-mapped NumPy columns
+per ticker that only downloads bars newer than the last stored date;
+``analyze_price_history`` computes returns, volatility, moving averages and
+correlations over it.
+
+Quotes are cached on disk under ``get_stock_info``: fundamentals for a day,
+prices for a minute while the market is open and until the next open when
+it is closed.
+
 Requirements:
 - phidata
 - yfinance
 - pandas
+- numpy
 - openai
 - OpenAI API key
 
@@ -15,59 +36,663 @@ Author: AI Agents Article Examples
 """
 
 import os
+import re
+import sys
+import time
+import random
+import zlib
+import json
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import yfinance as yf
 import pandas as pd
 from phidata.assistant import Assistant
 from phidata.tools import FunctionTool
 from phi.model.openai import OpenAIChat
 
-# Define financial data functions
+QUOTE_WORKERS = int(os.environ.get("FINANCE_QUOTE_WORKERS", "16"))
+CACHE_PATH = os.environ.get("FINANCE_CACHE_PATH", "./finance_cache/quotes.db")
+PRICE_TTL = float(os.environ.get("FINANCE_PRICE_TTL", "60"))
+FUNDAMENTAL_TTL = float(os.environ.get("FINANCE_FUNDAMENTAL_TTL", "86400"))
+HISTORY_DIR = os.environ.get("FINANCE_HISTORY_DIR", "./finance_cache/history")
+HISTORY_YEARS = int(os.environ.get("FINANCE_HISTORY_YEARS", "5"))
+TRADING_DAYS = 252
+
+# Symbols like BRK-B, ^GSPC or EURUSD=X; never a path
+TICKER_PATTERN = re.compile(r"[A-Za-z0-9^][A-Za-z0-9.^=-]*")
+
+# Regular NYSE/Nasdaq session (exchange holidays are not modelled)
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+
+# Output field -> yfinance `info` key
+QUOTE_FIELDS = {
+    "company_name": "shortName",
+    "current_price": "currentPrice",
+    "market_cap": "marketCap",
+    "pe_ratio": "forwardPE",
+    "dividend_yield": "dividendYield",
+    "fifty_two_week_high": "fiftyTwoWeekHigh",
+    "fifty_two_week_low": "fiftyTwoWeekLow"
+}
+PRICE_FIELDS = ("current_price", "fifty_two_week_high", "fifty_two_week_low")
+PRICE_KEYS = [QUOTE_FIELDS[field] for field in PRICE_FIELDS]
+FUNDAMENTAL_KEYS = [key for key in QUOTE_FIELDS.values() if key not in PRICE_KEYS]
+
+
+class YahooQuoteSource:
+    """Quote source backed by yfinance"""
+    
+    def info(self, ticker: str) -> dict:
+        """Full `info` dict for one ticker (one HTTP round-trip)"""
+        return yf.Ticker(ticker).info
+    
+    def prices(self, ticker: str) -> dict:
+        """Price fields for one ticker from the lightweight `fast_info`"""
+        fast = yf.Ticker(ticker).fast_info
+        return {
+            QUOTE_FIELDS["current_price"]: fast.last_price,
+            QUOTE_FIELDS["fifty_two_week_high"]: fast.year_high,
+            QUOTE_FIELDS["fifty_two_week_low"]: fast.year_low
+        }
+    
+    def bulk_prices(self, tickers: list) -> dict:
+        """Last price and 52-week range for all tickers in one download"""
+        history = yf.download(
+            tickers, period="1y", group_by="column", progress=False, threads=True
+        )
+        closes = history["Close"].ffill().iloc[-1]
+        return {
+            "current_price": closes.reindex(tickers).tolist(),
+            "fifty_two_week_high": history["High"].max().reindex(tickers).tolist(),
+            "fifty_two_week_low": history["Low"].min().reindex(tickers).tolist()
+        }
+    
+    def bulk_history(self, tickers: list, start: str) -> dict:
+        """Adjusted daily closes since ``start`` for all tickers in one download"""
+        closes = yf.download(
+            tickers, start=start, auto_adjust=True, group_by="column", progress=False,
+            threads=True
+        )["Close"]
+        return {ticker: closes[ticker].dropna()
+                for ticker in tickers if ticker in closes}
+
+
+class StubQuoteSource:
+    """Offline quote source with injected latency and request counts, for benchmarks"""
+    
+    def __init__(self, latency=0.05, bulk_latency=0.5, failure_rate=0.02, seed=0):
+        self.latency = latency
+        self.bulk_latency = bulk_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = {"info": 0, "prices": 0, "bulk_prices": 0}
+        self._lock = threading.Lock()
+    
+    def _request(self, kind, latency):
+        with self._lock:
+            self.calls[kind] += 1
+        time.sleep(latency)
+    
+    def _quote(self, ticker: str) -> dict:
+        seed = zlib.crc32(ticker.encode())
+        price = 20 + seed % 480
+        return {
+            "shortName": f"{ticker} Corp",
+            "currentPrice": price,
+            "marketCap": price * 1_000_000_000,
+            "forwardPE": 5 + (seed >> 9) % 45,
+            "dividendYield": ((seed >> 17) % 50) / 1000 or None,
+            "fiftyTwoWeekHigh": price * 1.3,
+            "fiftyTwoWeekLow": price * 0.7
+        }
+    
+    def info(self, ticker: str) -> dict:
+        self._request("info", self.latency)
+        if self.random.random() < self.failure_rate:
+            raise ConnectionError(f"stub failure for {ticker}")
+        return self._quote(ticker)
+    
+    def prices(self, ticker: str) -> dict:
+        self._request("prices", self.latency)
+        if self.random.random() < self.failure_rate:
+            raise ConnectionError(f"stub failure for {ticker}")
+        return {key: self._quote(ticker)[key] for key in PRICE_KEYS}
+    
+    def bulk_prices(self, tickers: list) -> dict:
+        self._request("bulk_prices", self.bulk_latency)
+        quotes = [self._quote(t) for t in tickers]
+        return {field: [q[QUOTE_FIELDS[field]] for q in quotes]
+                for field in PRICE_FIELDS}
+    
+    def bulk_history(self, tickers: list, start: str) -> dict:
+        time.sleep(self.bulk_latency)
+        dates = pd.bdate_range(start, pd.Timestamp.now(MARKET_TZ).date())
+        history = {}
+        for ticker in tickers:
+            rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+            steps = rng.normal(0.0003, 0.015, len(dates))
+            closes = self._quote(ticker)["currentPrice"] * np.exp(np.cumsum(steps))
+            history[ticker] = pd.Series(closes, index=dates)
+        return history
+
+
+def price_expiry(now: float) -> float:
+    """Expiry time for a price fetched at ``now`` (epoch seconds).
+    
+    While the market is open prices live for PRICE_TTL, capped at the
+    close so the closing price is picked up. Outside trading hours they
+    stay valid until the next open.
+    """
+    local = datetime.fromtimestamp(now, MARKET_TZ)
+    open_at = local.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1],
+                            second=0, microsecond=0)
+    close_at = local.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1],
+                             second=0, microsecond=0)
+    if local.weekday() < 5 and open_at <= local < close_at:
+        return min(now + PRICE_TTL, close_at.timestamp())
+    if local.weekday() >= 5 or local >= close_at:
+        open_at += timedelta(days=1)
+    while open_at.weekday() >= 5:
+        open_at += timedelta(days=1)
+    return open_at.timestamp()
+
+
+class QuoteCache:
+    """Disk-backed quote cache with separate price and fundamental entries.
+    
+    Each ticker has a ``price`` and a ``fundamental`` row in SQLite, each
+    with its own expiry, so a stale price never forces fundamentals to be
+    treated as stale (and vice versa). Survives restarts.
+    """
+    
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = {
+            "price": {"hits": 0, "misses": 0},
+            "fundamental": {"hits": 0, "misses": 0},
+        }
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS quotes (
+                ticker TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (ticker, kind)
+            )"""
+        )
+        self._conn.commit()
+    
+    def get(self, ticker, kind):
+        """Return the fresh cached fields for ``ticker``/``kind`` or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM quotes WHERE ticker = ? AND kind = ? AND expires > ?",
+                (ticker, kind, time.time())
+            ).fetchone()
+            self.stats[kind]["hits" if row else "misses"] += 1
+        return json.loads(row[0]) if row else None
+    
+    def put(self, ticker, kind, data):
+        now = time.time()
+        expires = price_expiry(now) if kind == "price" else now + FUNDAMENTAL_TTL
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO quotes VALUES (?, ?, ?, ?)",
+                (ticker, kind, json.dumps(data, default=str), expires)
+            )
+            self._conn.commit()
+    
+    def expire(self, kind):
+        """Mark every ``kind`` entry stale, keeping it stored"""
+        with self._lock:
+            self._conn.execute("UPDATE quotes SET expires = 0 WHERE kind = ?", (kind,))
+            self._conn.commit()
+    
+    def report(self):
+        """Hit/miss counts and hit rate per entry kind"""
+        report = {}
+        for kind, counts in self.stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            report[kind] = {**counts, "hit_rate": counts["hits"] / max(1, lookups)}
+        return report
+
+
+class CachedQuoteSource:
+    """Quote source wrapper that serves repeat lookups from a QuoteCache"""
+    
+    def __init__(self, source, cache: QuoteCache):
+        self.source = source
+        self.cache = cache
+    
+    def _refresh(self, ticker: str) -> dict:
+        # One `info` request returns both kinds, so refresh both
+        info = self.source.info(ticker)
+        self.cache.put(ticker, "price", {key: info.get(key) for key in PRICE_KEYS})
+        self.cache.put(ticker, "fundamental",
+                       {key: info.get(key) for key in FUNDAMENTAL_KEYS})
+        return info
+    
+    def fundamentals(self, ticker: str) -> dict:
+        """Cached fundamental fields; a miss fetches (and caches) full `info`"""
+        fundamental = self.cache.get(ticker, "fundamental")
+        return fundamental if fundamental is not None else self._refresh(ticker)
+    
+    def prices(self, ticker: str) -> dict:
+        """Cached price fields; a miss uses the source's cheap price lookup"""
+        price = self.cache.get(ticker, "price")
+        if price is None:
+            price = self.source.prices(ticker)
+            self.cache.put(ticker, "price", price)
+        return price
+    
+    def info(self, ticker: str) -> dict:
+        fundamental = self.cache.get(ticker, "fundamental")
+        if fundamental is None:
+            return self._refresh(ticker)
+        # Fresh fundamentals only need their prices brought up to date
+        return {**fundamental, **self.prices(ticker)}
+    
+    def bulk_prices(self, tickers: list) -> dict:
+        cached = {ticker: self.cache.get(ticker, "price") for ticker in tickers}
+        missing = [ticker for ticker, price in cached.items() if price is None]
+        if missing and hasattr(self.source, "bulk_prices"):
+            fetched = self.source.bulk_prices(missing)
+            for i, ticker in enumerate(missing):
+                price = {QUOTE_FIELDS[field]: fetched[field][i]
+                         for field in PRICE_FIELDS}
+                if pd.notna(price[QUOTE_FIELDS["current_price"]]):
+                    self.cache.put(ticker, "price", price)
+                    cached[ticker] = price
+        return {
+            field: [(cached[t] or {}).get(QUOTE_FIELDS[field]) for t in tickers]
+            for field in PRICE_FIELDS
+        }
+
+
+quote_cache = QuoteCache(CACHE_PATH)
+quote_source = CachedQuoteSource(YahooQuoteSource(), quote_cache)
+
+
 def get_stock_info(ticker: str) -> dict:
     """Get detailed stock information"""
-    stock = yf.Ticker(ticker)
-    info = stock.info
-    return {
-        "company_name": info.get("shortName"),
-        "current_price": info.get("currentPrice"),
-        "market_cap": info.get("marketCap"),
-        "pe_ratio": info.get("forwardPE"),
-        "dividend_yield": info.get("dividendYield"),
-        "fifty_two_week_high": info.get("fiftyTwoWeekHigh"),
-        "fifty_two_week_low": info.get("fiftyTwoWeekLow")
-    }
+    info = quote_source.info(ticker)
+    return {field: info.get(key) for field, key in QUOTE_FIELDS.items()}
+
+
+def fetch_quotes(tickers: list, source=None,
+                 max_workers: int = QUOTE_WORKERS) -> pd.DataFrame:
+    """Fetch quotes for many tickers concurrently into a columnar DataFrame.
+    
+    With a caching source, fundamentals are served from the cache (only
+    stale tickers cost an `info` request, which also refreshes their
+    prices). The tickers still without a price then get one bulk download,
+    which itself skips tickers whose cached price is fresh; any it misses
+    fall back to a per-ticker price lookup. Other sources get one `info` request per
+    ticker on a bounded thread pool. A ticker whose fetch fails gets empty
+    fields and its error in the ``error`` column instead of failing the
+    whole batch.
+    """
+    source = source or quote_source
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    columns = {field: [None] * len(tickers) for field in QUOTE_FIELDS}
+    errors = [None] * len(tickers)
+    split = hasattr(source, "fundamentals") and hasattr(source, "bulk_prices")
+    
+    def fetch(position, ticker):
+        try:
+            info = source.fundamentals(ticker) if split else source.info(ticker)
+        except Exception as e:
+            errors[position] = f"{type(e).__name__}: {e}"
+            return
+        for field, key in QUOTE_FIELDS.items():
+            columns[field][position] = info.get(key)
+    
+    def fetch_price(position, ticker):
+        try:
+            price = source.prices(ticker)
+        except Exception as e:
+            errors[position] = f"{type(e).__name__}: {e}"
+            return
+        for field in PRICE_FIELDS:
+            columns[field][position] = price.get(QUOTE_FIELDS[field])
+    
+    def unpriced():
+        return [i for i, price in enumerate(columns["current_price"])
+                if errors[i] is None and pd.isna(price)]
+    
+    workers = max(1, min(max_workers, len(tickers)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, range(len(tickers)), tickers))
+        # Tickers whose `info` was just fetched already have fresh prices
+        needed = unpriced() if split else []
+        if needed:
+            try:
+                bulk = source.bulk_prices([tickers[i] for i in needed])
+                for field, values in bulk.items():
+                    for i, value in zip(needed, values):
+                        if pd.notna(value):
+                            columns[field][i] = value
+            except Exception as e:
+                print(f"Bulk price download failed, fetching prices per ticker: {e}")
+            missing = unpriced()
+            list(executor.map(fetch_price, missing, [tickers[i] for i in missing]))
+    
+    return pd.DataFrame({"ticker": tickers, **columns, "error": errors})
+
 
 def compare_stocks(tickers: list) -> pd.DataFrame:
     """Compare multiple stocks side by side"""
-    data = []
+    return fetch_quotes(tickers)
+
+
+def benchmark_quote_fetching(num_tickers: int = 200, latency: float = 0.05):
+    """Compare serial per-ticker fetching with fetch_quotes on a stub source.
+    
+    fetch_quotes runs through a CachedQuoteSource three times: on a cold
+    cache, on a warm one, and with fundamentals cached but prices expired
+    (the bulk price path).
+    """
+    tickers = [f"T{i:03d}" for i in range(num_tickers)]
+    source = StubQuoteSource(latency=latency)
+    
+    start = time.perf_counter()
+    rows = []
     for ticker in tickers:
-        info = get_stock_info(ticker)
-        info["ticker"] = ticker.upper()
-        data.append(info)
-    return pd.DataFrame(data)
+        try:
+            info = source.info(ticker)
+        except Exception:
+            info = {}
+        rows.append({"ticker": ticker,
+                     **{f: info.get(k) for f, k in QUOTE_FIELDS.items()}})
+    serial_df = pd.DataFrame(rows)
+    serial = time.perf_counter() - start
+    print(f"{num_tickers} tickers at {latency * 1000:.0f}ms per request:")
+    print(f"  serial      : {serial:.2f}s ({len(serial_df)} rows, "
+          f"{num_tickers} info requests)")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = QuoteCache(os.path.join(tmp, "quotes.db"))
+        cached_source = CachedQuoteSource(source, cache)
+        for label in ("cold cache", "warm cache", "stale prices"):
+            if label == "stale prices":
+                cache.expire("price")
+            before = dict(source.calls)
+            start = time.perf_counter()
+            batched_df = fetch_quotes(tickers, source=cached_source)
+            batched = time.perf_counter() - start
+            calls = {kind: source.calls[kind] - before[kind] for kind in before}
+            failed = batched_df["error"].notna().sum()
+            print(f"  {label:12s}: {batched:.2f}s ({len(batched_df)} rows, "
+                  f"{failed} isolated failures) -> {serial / batched:.1f}x faster; "
+                  f"{calls['info']} info, {calls['bulk_prices']} bulk, "
+                  f"{calls['prices']} per-ticker price requests")
+
+
+def screen_stocks(df: pd.DataFrame, top_n: int = 10,
+                  sort: bool = True) -> pd.DataFrame:
+    """Score a compare_stocks DataFrame and return the top-N rows.
+    
+    All metrics are computed column-wise, so screening thousands of tickers
+    costs a handful of array operations rather than a Python loop.
+    
+    Args:
+        df: Output of compare_stocks / fetch_quotes
+        top_n: Number of best-scoring rows to keep (None keeps all)
+        sort: Order rows by score; False keeps the input order
+    
+    Returns:
+        Compact table indexed by ticker: valuation bucket, P/E, dividend
+        yield (%), annual dividend per share, position in the 52-week range,
+        per-metric ranks and a composite score (lower rank is better).
+        Any P/E below 20, negative included, is bucketed as potentially
+        undervalued, as in the original report; only positive P/Es are
+        ranked.
+    """
+    df = df.reindex(columns=["ticker", *QUOTE_FIELDS, "error"])
+    df = df[df["error"].isna()]
+    
+    def numeric(column):
+        return pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+    
+    pe = numeric("pe_ratio")
+    price = numeric("current_price")
+    dividend = numeric("dividend_yield")
+    dividend = np.where(np.isnan(dividend), 0.0, dividend)
+    high = numeric("fifty_two_week_high")
+    low = numeric("fifty_two_week_low")
+    
+    valued_pe = np.where(pe > 0, pe, np.nan)
+    span = high - low
+    screened = pd.DataFrame({
+        "company_name": df["company_name"].to_numpy(),
+        "valuation": np.select(
+            [(pe != 0) & (pe < 20), pe > 30],
+            ["potentially undervalued", "potentially overvalued"],
+            "fairly valued"
+        ),
+        "pe_ratio": pe,
+        "dividend_yield_pct": dividend * 100,
+        "annual_dividend": price * dividend,
+        "range_position": np.divide(price - low, span, out=np.full_like(span, np.nan),
+                                    where=span > 0)
+    }, index=pd.Index(df["ticker"].to_numpy(), name="ticker"))
+    
+    screened["pe_rank"] = pd.Series(valued_pe, index=screened.index).rank(
+        method="min", na_option="bottom"
+    )
+    screened["yield_rank"] = screened["dividend_yield_pct"].rank(method="min",
+                                                                 ascending=False)
+    screened["score"] = screened[["pe_rank", "yield_rank"]].mean(axis=1)
+    if sort:
+        screened = screened.sort_values(["score", "pe_rank"])
+    return screened.head(top_n) if top_n else screened
+
+
+def screen_tickers(tickers: list, top_n: int = 10) -> str:
+    """Screen tickers by valuation and dividends; returns the top-N table"""
+    table = screen_stocks(compare_stocks(tickers), top_n=top_n)
+    return table.round(2).to_string()
+
 
 def generate_analysis_report(stock_data: dict) -> str:
     """Generate investment analysis summary"""
-    analysis = []
-    for ticker, info in stock_data.items():
-        pe = info.get("pe_ratio", 0)
-        div = info.get("dividend_yield", 0)
-        
-        if pe and pe < 20:
-            valuation = "potentially undervalued"
-        elif pe and pe > 30:
-            valuation = "potentially overvalued"
-        else:
-            valuation = "fairly valued"
-        
-        analysis.append(f"""
-        {ticker.upper()} Analysis:
-        - Current valuation appears {valuation}
-        - P/E Ratio: {pe:.2f}
-        - Dividend Yield: {(div * 100):.2f}% if div else "N/A"
-        """)
+    if not stock_data:
+        return ""
+    df = pd.DataFrame.from_dict(stock_data, orient="index")
+    df["ticker"] = [str(ticker).upper() for ticker in df.index]
+    screened = screen_stocks(df.reset_index(drop=True), top_n=None, sort=False)
     
+    pe_text = (screened["pe_ratio"].map("{:.2f}".format)
+               .where(screened["pe_ratio"].notna(), "N/A"))
+    dividend_text = (screened["dividend_yield_pct"].map("{:.2f}%".format)
+                     .where(screened["dividend_yield_pct"] > 0, "N/A"))
+    analysis = (
+        "\n        " + screened.index + " Analysis:"
+        + "\n        - Current valuation appears " + screened["valuation"]
+        + "\n        - P/E Ratio: " + pe_text
+        + "\n        - Dividend Yield: " + dividend_text
+        + "\n        "
+    )
     return "\n".join(analysis)
 
+
+def day_number(timestamp) -> int:
+    """Days since the Unix epoch for a naive timestamp"""
+    day = pd.Timestamp(timestamp).to_datetime64().astype("datetime64[D]")
+    return int(day.astype(np.int64))
+
+
+class PriceHistoryStore:
+    """Local columnar store of daily closes, one pair of flat files per ticker.
+    
+    ``{TICKER}.dates`` holds int64 day numbers and ``{TICKER}.close`` the
+    float64 adjusted closes; both are memory-mapped for reads and only ever
+    appended to; an update first truncates both to their common length, so
+    a crash between the two appends can't misalign later rows. Updates
+    download just the bars after the last stored date, in one bulk request
+    per distinct start date (typically one for new tickers and one for
+    tickers that are a few bars behind). Past closes are not
+    re-adjusted for later splits or dividends; delete a ticker's files to
+    rebuild it.
+    """
+    
+    def __init__(self, directory, source=None):
+        self.directory = directory
+        self.source = source or YahooQuoteSource()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def _file(self, ticker, column):
+        if not TICKER_PATTERN.fullmatch(ticker):
+            raise ValueError(f"Invalid ticker symbol: {ticker!r}")
+        return os.path.join(self.directory, f"{ticker}.{column}")
+    
+    def _align(self, ticker):
+        """Truncate both columns to the rows they have in common"""
+        paths = [self._file(ticker, "dates"), self._file(ticker, "close")]
+        sizes = [os.path.getsize(p) if os.path.exists(p) else 0 for p in paths]
+        # Both columns are 8-byte values
+        common = min(sizes) // 8 * 8
+        for path, size in zip(paths, sizes):
+            if size > common:
+                os.truncate(path, common)
+    
+    def _load(self, ticker):
+        """Memory-map (dates, closes) for ``ticker``; empty arrays if none"""
+        path = self._file(ticker, "dates")
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        dates = np.memmap(path, dtype=np.int64, mode="r")
+        closes = np.memmap(self._file(ticker, "close"), dtype=np.float64, mode="r")
+        # A crash between the two appends leaves one column longer
+        n = min(len(dates), len(closes))
+        return dates[:n], closes[:n]
+    
+    def update(self, tickers: list) -> dict:
+        """Append bars newer than each ticker's last stored date.
+        
+        Returns:
+            Number of bars appended per ticker
+        """
+        # Only completed sessions are stored, never today's partial bar
+        now = pd.Timestamp.now(MARKET_TZ)
+        minutes = now.hour * 60 + now.minute
+        session_closed = minutes >= MARKET_CLOSE[0] * 60 + MARKET_CLOSE[1]
+        latest = now.normalize().tz_localize(None)
+        if not session_closed or latest.weekday() >= 5:
+            latest -= pd.tseries.offsets.BDay(1)
+        default_start = latest - pd.DateOffset(years=HISTORY_YEARS)
+        with self._lock:
+            last = {}
+            for ticker in tickers:
+                self._align(ticker)
+                dates, _ = self._load(ticker)
+                last[ticker] = (pd.Timestamp(int(dates[-1]), unit="D")
+                                if len(dates) else None)
+            stale = [t for t in tickers if last[t] is None or last[t] < latest]
+            if not stale:
+                return {ticker: 0 for ticker in tickers}
+            # One bulk download per start date, so a new ticker's full history
+            # is not re-fetched for tickers that only need their latest bars
+            groups = {}
+            for t in stale:
+                if last[t] is None:
+                    start = default_start
+                else:
+                    start = last[t] + pd.Timedelta(days=1)
+                groups.setdefault(start.strftime("%Y-%m-%d"), []).append(t)
+            history = {}
+            for start, group in groups.items():
+                history.update(self.source.bulk_history(group, start))
+            
+            appended = {ticker: 0 for ticker in tickers}
+            for ticker in stale:
+                series = history.get(ticker)
+                if series is None or series.empty:
+                    continue
+                index = pd.DatetimeIndex(series.index)
+                if index.tz is not None:
+                    index = index.tz_localize(None)
+                days = index.normalize().to_numpy(dtype="datetime64[D]")
+                days = days.astype(np.int64)
+                values = series.to_numpy(dtype=np.float64)
+                first = -1 if last[ticker] is None else day_number(last[ticker])
+                keep = (days > first) & (days <= day_number(latest))
+                days, values = days[keep], values[keep]
+                if not len(days):
+                    continue
+                with open(self._file(ticker, "close"), "ab") as f:
+                    f.write(values.tobytes())
+                with open(self._file(ticker, "dates"), "ab") as f:
+                    f.write(days.tobytes())
+                appended[ticker] = len(days)
+            return appended
+    
+    def closes(self, tickers: list, days: int = None) -> pd.DataFrame:
+        """Date x ticker frame of closes (outer-joined on date)"""
+        columns = {}
+        for ticker in tickers:
+            dates, closes = self._load(ticker)
+            if days:
+                dates, closes = dates[-days:], closes[-days:]
+            columns[ticker] = pd.Series(
+                np.asarray(closes), index=pd.to_datetime(np.asarray(dates), unit="D")
+            )
+        return pd.DataFrame(columns).sort_index()
+
+
+price_history = PriceHistoryStore(HISTORY_DIR)
+
+
+def analyze_price_history(tickers: list, lookback_days: int = TRADING_DAYS) -> str:
+    """Returns, volatility, moving averages and correlations from price history.
+    
+    Args:
+        tickers: Tickers to analyze together
+        lookback_days: Trading days of history to analyze (default one year)
+    
+    Returns:
+        Per-ticker metrics table followed by the return correlation matrix
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    price_history.update(tickers)
+    # Keep enough bars for the 200-day average on top of the lookback
+    closes = price_history.closes(tickers, days=lookback_days + 200)
+    if closes.empty:
+        return "No price history available for: " + ", ".join(tickers)
+    
+    window = closes.iloc[-lookback_days:]
+    returns = np.log(window).diff().iloc[1:]
+    ma_50 = closes.rolling(50).mean().iloc[-1]
+    ma_200 = closes.rolling(200).mean().iloc[-1]
+    last = closes.ffill().iloc[-1]
+    metrics = pd.DataFrame({
+        "last_close": last,
+        "total_return_pct": (
+            (window.ffill().iloc[-1] / window.bfill().iloc[0] - 1) * 100
+        ),
+        "annualized_vol_pct": returns.std() * np.sqrt(TRADING_DAYS) * 100,
+        "ma_50": ma_50,
+        "ma_200": ma_200,
+        "vs_ma_200_pct": (last / ma_200 - 1) * 100
+    })
+    return (f"Last {len(window)} trading days:\n{metrics.round(2).to_string()}\n\n"
+            f"Daily return correlations:\n{returns.corr().round(2).to_string()}")
+
+
+if len(sys.argv) > 1 and sys.argv[1] == "benchmark-quotes":
+    benchmark_quote_fetching()
+    sys.exit(0)
+
 # Initialize the financial assistant
 financial_assistant = Assistant(
     name="FinancialAnalyst",
@@ -76,7 +701,9 @@ financial_assistant = Assistant(
     tools=[
         FunctionTool.from_function(get_stock_info),
         FunctionTool.from_function(compare_stocks),
-        FunctionTool.from_function(generate_analysis_report)
+        FunctionTool.from_function(screen_tickers),
+        FunctionTool.from_function(generate_analysis_report),
+        FunctionTool.from_function(analyze_price_history)
     ],
     show_tool_calls=True
 )
@@ -92,9 +719,23 @@ Generate a comprehensive investment report for Tesla (TSLA)
 and include recommendations based on current metrics.
 """)
 
+cache_report = quote_cache.report()
+print(f"Quote cache: prices {cache_report['price']['hits']} hits / "
+      f"{cache_report['price']['misses']} misses, fundamentals "
+      f"{cache_report['fundamental']['hits']} hits / "
+      f"{cache_report['fundamental']['misses']} misses")
+
 if __name__ == "__main__":
     # How to run this code:
-    # 1. pip install phidata yfinance pandas openai
+    # 1. pip install phidata yfinance pandas numpy openai
     # 2. Set OPENAI_API_KEY environment variable
     # 3. Run: python 06_phidata_financial_assistant.py
+    # 4. Benchmark batched quote fetching offline (no network):
+    #    python 06_phidata_financial_assistant.py benchmark-quotes
+    #    (pool size: FINANCE_QUOTE_WORKERS)
+    # 5. Quotes are cached in FINANCE_CACHE_PATH; tune FINANCE_PRICE_TTL
+    #    (market hours only) and FINANCE_FUNDAMENTAL_TTL, in seconds
+    # 6. Price history is stored in FINANCE_HISTORY_DIR; the first request for
+    #    a ticker downloads FINANCE_HISTORY_YEARS of closes, later ones only
+    #    the new bars
     pass
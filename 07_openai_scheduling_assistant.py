@@ -4,6 +4,13 @@ OpenAI Assistants API - Calendar and Scheduling Management
 Purpose-built solution for building AI assistants with persistent threads,
 built-in retrieval, and function calling capabilities.
 
+Runs are awaited asynchronously: from streamed run events when the API and
+SDK support them, otherwise by polling with an interval that starts short
+and backs off exponentially up to a cap. Independent requests run
+concurrently. `python 07_openai_scheduling_assistant.py benchmark-runs`
+compares this against the old fixed 1-second polling loop on a local mock
+of the Assistants endpoints.
+
 Requirements:
 - openai
 - OpenAI API key
@@ -12,11 +19,238 @@ Author: AI Agents Article Examples
 """
 
 import os
+import sys
 import time
-from openai import OpenAI
+import random
+import asyncio
+from types import SimpleNamespace
+from openai import OpenAI, AsyncOpenAI
+
+RUN_STREAMING = os.environ.get("ASSISTANT_RUN_STREAMING", "True").lower() == "true"
+POLL_INITIAL_INTERVAL = float(os.environ.get("ASSISTANT_POLL_INITIAL_INTERVAL", "0.5"))
+POLL_MAX_INTERVAL = float(os.environ.get("ASSISTANT_POLL_MAX_INTERVAL", "3.0"))
+POLL_BACKOFF = float(os.environ.get("ASSISTANT_POLL_BACKOFF", "1.5"))
+MAX_CONCURRENT_RUNS = int(os.environ.get("ASSISTANT_MAX_CONCURRENT_RUNS", "8"))
+
+TERMINAL_RUN_STATUSES = {
+    "completed", "requires_action", "failed", "cancelled", "expired", "incomplete"
+}
+
+
+async def poll_run(client, thread_id: str, run, initial=POLL_INITIAL_INTERVAL,
+                   maximum=POLL_MAX_INTERVAL, backoff=POLL_BACKOFF):
+    """Poll ``run`` until it leaves queued/in_progress.
+    
+    The first checks come quickly, so short runs return with little added
+    latency, and the interval then grows geometrically up to ``maximum`` so
+    long runs are not checked more often than needed.
+    """
+    delay = initial
+    while run.status not in TERMINAL_RUN_STATUSES:
+        await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(delay * backoff, maximum)
+        run = await client.beta.threads.runs.retrieve(thread_id=thread_id,
+                                                      run_id=run.id)
+    return run
+
+
+class RunWaiter:
+    """Starts assistant runs and waits for them to finish.
+    
+    Uses streamed run events when ``streaming`` is on, switching to
+    adaptive polling for good if the SDK does not accept ``stream=True``,
+    or for the current run if its stream ends before a terminal event.
+    """
+    
+    def __init__(self, client, streaming=RUN_STREAMING):
+        self.client = client
+        self.streaming = streaming
+    
+    async def create_and_wait(self, thread_id: str, assistant_id: str):
+        """Start a run on ``thread_id`` and return it in a terminal state"""
+        runs = self.client.beta.threads.runs
+        if self.streaming:
+            try:
+                stream = await runs.create(thread_id=thread_id,
+                                           assistant_id=assistant_id, stream=True)
+            except TypeError:
+                self.streaming = False
+            else:
+                run = None
+                async with stream:
+                    async for event in stream:
+                        # Only run events; thread.run.step.* carry step statuses
+                        if getattr(event.data, "object", None) == "thread.run":
+                            run = event.data
+                            if run.status in TERMINAL_RUN_STATUSES:
+                                return run
+                if run is None:
+                    raise RuntimeError("Run stream ended before the run was created")
+                return await poll_run(self.client, thread_id, run)
+        run = await runs.create(thread_id=thread_id, assistant_id=assistant_id)
+        return await poll_run(self.client, thread_id, run)
+
+
+class MockRunStream:
+    """Async-iterable, async-closeable wrapper like the SDK's AsyncStream"""
+    
+    def __init__(self, events):
+        self._events = events
+    
+    def __aiter__(self):
+        return self._events
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self._events.aclose()
+
+
+class MockAssistantsAPI:
+    """In-process stand-in for the Assistants thread/message/run endpoints.
+    
+    Exposes the same ``beta.threads`` call surface as ``AsyncOpenAI`` (runs
+    with and without ``stream=True``), finishes each run after a random
+    delay and counts API calls, so run-waiting strategies can be compared
+    offline. Streamed runs emit run step events between the run's own
+    events, as the real API does.
+    """
+    
+    def __init__(self, mean_run_seconds=1.5, supports_streaming=True):
+        self.mean_run_seconds = mean_run_seconds
+        self.supports_streaming = supports_streaming
+        self.calls = 0
+        self.durations = {}
+        self._threads = {}
+        self._runs = {}
+        runs = SimpleNamespace(create=self._create_run, retrieve=self._retrieve_run)
+        messages = SimpleNamespace(create=self._create_message,
+                                   list=self._list_messages)
+        threads = SimpleNamespace(create=self._create_thread, runs=runs,
+                                  messages=messages)
+        self.beta = SimpleNamespace(threads=threads)
+    
+    def _run_view(self, run_id):
+        run = self._runs[run_id]
+        done = time.monotonic() >= run["finishes_at"]
+        return SimpleNamespace(id=run_id, object="thread.run",
+                               status="completed" if done else "in_progress")
+    
+    async def _create_thread(self, **kwargs):
+        self.calls += 1
+        thread_id = f"thread_{len(self._threads)}"
+        self._threads[thread_id] = []
+        return SimpleNamespace(id=thread_id)
+    
+    async def _create_message(self, thread_id, role, content):
+        self.calls += 1
+        self._threads[thread_id].append(content)
+    
+    async def _list_messages(self, thread_id):
+        self.calls += 1
+        text = SimpleNamespace(value=f"Mock reply to: {self._threads[thread_id][-1]}")
+        message = SimpleNamespace(content=[SimpleNamespace(text=text)])
+        return SimpleNamespace(data=[message])
+    
+    async def _create_run(self, thread_id, assistant_id, stream=False):
+        if stream and not self.supports_streaming:
+            raise TypeError("create() got an unexpected keyword argument 'stream'")
+        self.calls += 1
+        run_id = f"run_{len(self._runs)}"
+        duration = random.expovariate(1 / self.mean_run_seconds)
+        self._runs[run_id] = {"finishes_at": time.monotonic() + duration}
+        self.durations[run_id] = duration
+        if not stream:
+            return SimpleNamespace(id=run_id, object="thread.run", status="queued")
+        
+        def step(event, status):
+            return SimpleNamespace(
+                event=f"thread.run.step.{event}",
+                data=SimpleNamespace(id=f"step_{run_id}", object="thread.run.step",
+                                     status=status)
+            )
+        
+        async def events():
+            yield SimpleNamespace(event="thread.run.created", data=SimpleNamespace(
+                id=run_id, object="thread.run", status="queued"))
+            yield SimpleNamespace(event="thread.run.in_progress",
+                                  data=self._run_view(run_id))
+            # A tool-call step completes before the message step and the run
+            for _ in range(2):
+                yield step("created", "in_progress")
+                await asyncio.sleep(duration / 2)
+                yield step("completed", "completed")
+            yield SimpleNamespace(event="thread.run.completed",
+                                  data=self._run_view(run_id))
+        return MockRunStream(events())
+    
+    async def _retrieve_run(self, thread_id, run_id):
+        self.calls += 1
+        return self._run_view(run_id)
 
-# Initialize the client
+
+async def legacy_wait(client, thread_id: str, assistant_id: str):
+    """The previous strategy: create the run, then check it every second"""
+    run = await client.beta.threads.runs.create(thread_id=thread_id,
+                                                assistant_id=assistant_id)
+    while run.status in ["queued", "in_progress"]:
+        await asyncio.sleep(1)
+        run = await client.beta.threads.runs.retrieve(thread_id=thread_id,
+                                                      run_id=run.id)
+    return run
+
+
+async def benchmark_run_waiting(num_requests=20, mean_run_seconds=1.5):
+    """Compare run-waiting strategies on the mock Assistants API"""
+    async def one_request(client, wait):
+        thread = await client.beta.threads.create()
+        await client.beta.threads.messages.create(thread_id=thread.id, role="user",
+                                                  content="Book a room")
+        start = time.perf_counter()
+        run = await wait(client, thread.id, "asst_mock")
+        latency = time.perf_counter() - start
+        await client.beta.threads.messages.list(thread_id=thread.id)
+        return latency - client.durations[run.id]
+    
+    def polled(client, thread_id, assistant_id):
+        waiter = RunWaiter(client, streaming=False)
+        return waiter.create_and_wait(thread_id, assistant_id)
+    
+    def streamed(client, thread_id, assistant_id):
+        return RunWaiter(client).create_and_wait(thread_id, assistant_id)
+    
+    strategies = [
+        ("1s polling, serial (old)", legacy_wait, False, True),
+        ("adaptive polling, concurrent", polled, True, True),
+        ("streamed events, concurrent", streamed, True, True),
+        ("stream unsupported -> polling", streamed, True, False),
+    ]
+    print(f"{num_requests} scheduling requests, mean run time {mean_run_seconds}s")
+    for name, wait, concurrent, streaming in strategies:
+        random.seed(0)
+        client = MockAssistantsAPI(mean_run_seconds, supports_streaming=streaming)
+        start = time.perf_counter()
+        if concurrent:
+            overheads = await asyncio.gather(
+                *(one_request(client, wait) for _ in range(num_requests))
+            )
+        else:
+            overheads = [await one_request(client, wait) for _ in range(num_requests)]
+        total = time.perf_counter() - start
+        print(f"  {name:32s} total {total:6.2f}s, mean wait after run finished "
+              f"{sum(overheads) / len(overheads):.2f}s (max {max(overheads):.2f}s), "
+              f"{client.calls} API calls")
+
+
+if len(sys.argv) > 1 and sys.argv[1] == "benchmark-runs":
+    asyncio.run(benchmark_run_waiting())
+    sys.exit(0)
+
+# Initialize the clients: sync for setup, async for serving requests
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+async_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+run_waiter = RunWaiter(async_client)
 
 # Create the scheduling assistant
 assistant = client.beta.assistants.create(
@@ -63,54 +297,93 @@ assistant = client.beta.assistants.create(
 )
 
 # Create a new thread for the conversation
-thread = client.beta.threads.create(
-    thread={"messages": []}
-)
+thread = client.beta.threads.create()
+
+# A thread allows one active run at a time, so runs on it are serialized
+thread_locks = {}
+run_slots = None
 
-def schedule_meeting(user_request: str):
-    """Handle a scheduling request"""
+
+async def schedule_meeting(user_request: str, thread_id: str = None):
+    """Handle a scheduling request
     
-    # Add user message to thread
-    client.beta.threads.messages.create(
-        thread_id=thread.id,
-        role="user",
-        content=user_request
-    )
+    Args:
+        user_request: The user's message
+        thread_id: Conversation thread (defaults to the shared thread)
+    """
+    global run_slots
+    if run_slots is None:
+        run_slots = asyncio.Semaphore(MAX_CONCURRENT_RUNS)
+    thread_id = thread_id or thread.id
+    lock = thread_locks.setdefault(thread_id, asyncio.Lock())
     
-    # Run the assistant
-    run = client.beta.threads.runs.create(
-        thread_id=thread.id,
-        assistant_id=assistant.id
-    )
+    async with lock, run_slots:
+        # Add user message to thread
+        await async_client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=user_request
+        )
+        
+        # Run the assistant and wait for it to finish
+        run = await run_waiter.create_and_wait(thread_id, assistant.id)
+        
+        # Handle function calls if needed
+        if run.status == "requires_action":
+            # Function calling logic here
+            pass
+        
+        # Display assistant response
+        messages = await async_client.beta.threads.messages.list(thread_id=thread_id)
+        return messages.data[0].content[0].text.value
+
+
+async def schedule_meetings(user_requests: list) -> list:
+    """Handle independent requests concurrently, one thread each"""
+    async def handle(user_request):
+        request_thread = await async_client.beta.threads.create()
+        return await schedule_meeting(user_request, thread_id=request_thread.id)
+    return await asyncio.gather(*(handle(r) for r in user_requests))
+
+
+async def main():
+    # Example scheduling conversation on the shared thread
+    print("=== SCHEDULING ASSISTANT ===\n")
     
-    # Poll for completion
-    while run.status in ["queued", "in_progress"]:
-        time.sleep(1)
-        run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+    response1 = await schedule_meeting(
+        "Schedule a 1-hour meeting with the design team next Tuesday afternoon."
+    )
+    print(
+        f"User: Schedule a 1-hour meeting with the design team next Tuesday afternoon."
+    )
+    print(f"Assistant: {response1}\n")
     
-    # Handle function calls if needed
-    if run.status == "requires_action":
-        # Function calling logic here
-        pass
+    response2 = await schedule_meeting(
+        "What times are available Thursday morning for a client demo?"
+    )
+    print(f"User: What times are available Thursday morning for a client demo?")
+    print(f"Assistant: {response2}\n")
     
-    # Display assistant response
-    messages = client.beta.threads.messages.list(thread_id=thread.id)
-    return messages.data[0].content[0].text.value
-
-# Example scheduling conversations
-print("=== SCHEDULING ASSISTANT ===\n")
+    # Unrelated requests from different users run side by side
+    requests = [
+        "Find 30 minutes with the sales team on Friday.",
+        "Move my Monday 1:1 to Wednesday at the same time.",
+        "Book a 2-hour quarterly planning session next week.",
+    ]
+    for request, response in zip(requests, await schedule_meetings(requests)):
+        print(f"User: {request}")
+        print(f"Assistant: {response}\n")
 
-response1 = schedule_meeting("Schedule a 1-hour meeting with the design team next Tuesday afternoon.")
-print(f"User: Schedule a 1-hour meeting with the design team next Tuesday afternoon.")
-print(f"Assistant: {response1}\n")
 
-response2 = schedule_meeting("What times are available Thursday morning for a client demo?")
-print(f"User: What times are available Thursday morning for a client demo?")
-print(f"Assistant: {response2}\n")
+asyncio.run(main())
 
 if __name__ == "__main__":
     # How to run this code:
     # 1. pip install openai
     # 2. Set OPENAI_API_KEY
     # 3. Run: python 07_openai_scheduling_assistant.py
+    # 4. Compare run-waiting strategies offline on a mock Assistants API:
+    #    python 07_openai_scheduling_assistant.py benchmark-runs
+    #    (tune ASSISTANT_POLL_* and ASSISTANT_MAX_CONCURRENT_RUNS; set
+    #    ASSISTANT_RUN_STREAMING=False to always poll)
     pass